@@ -1,11 +1,10 @@
+import io
 from typing import Literal
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 
-from sqlalchemy import func
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import IntegrityError
 import streamlit_authenticator as stauth
 from functions import (
     add_group,
@@ -13,59 +12,78 @@ from functions import (
     add_transaction,
     distribute_funds,
     check_missing_payments,
+    schedule_issues,
     transfer_funds,
     delete_fund,
     add_monthly_amount,
     confirm_transaction,
+    confirm_transactions,
+    delete_transaction,
     bids_to_rent,
     calculate_rent_for_group,
+    calculate_rent_for_all_groups,
     current_payments,
     log_change,
+    house_totals,
+    ensure_fund_snapshots,
+    fund_balances_at,
 )
+import queries
+from bank_import import STATEMENT_ERRORS, import_statement, read_statement
+from bootstrap import init_db
+from export import export_table
+from forecast import FORECAST_YEARS, forecast_chart, forecast_funds
+from instrumentation import install as install_instrumentation, profile_tab
+from cache import ACCOUNTS_VERSION_KEY, bump_data_version, get_data_version
+from schedules import resolve_schedules
+from timeline import change_points, rent_timeline, step_chart
 from models import (
     Group,
     Fund,
-    Base,
+    Session,
     engine,
-    MonthlyCash,
-    Transaction,
     Room,
     PeopleCategory,
     Person,
     BiddingStatus,
     Bid,
     Expense,
-    ExpenseChangeLog,
-    FundChangeLog,
 )
 
-Base.metadata.create_all(bind=engine)
-Session = sessionmaker(bind=engine)
+init_db()
+install_instrumentation(engine)
 
 
 # Retrieve data from the database
-def get_groups():
-    with Session() as session:
-        return session.query(Group).all()
-
+@st.cache_resource(max_entries=1)
+def load_accounts(accounts_version: int):
+    """Loads login credentials, roles, groups and funds once per process.
 
-def get_funds():
+    The result is cached until the accounts version changes, i.e. until a
+    group, a password or the list of funds is modified. It is shared by all
+    sessions, so the credentials are kept as ``(name, password)`` tuples.
+    """
     with Session() as session:
-        return session.query(Fund).all()
+        groups = queries.all_groups(session)
+        funds = queries.all_funds(session)
 
+    accounts = tuple((group.name, group.password) for group in groups)
+    roles = {group.name: group.role for group in groups}
+    return accounts, roles, groups, funds
 
-groups = get_groups()
-funds = get_funds()
 
-# Authentication setup
-credentials = {"usernames": {}}
+with Session() as session:
+    accounts_version = get_data_version(session, ACCOUNTS_VERSION_KEY)
+accounts, roles, groups, funds = load_accounts(accounts_version)
 
-for group in groups:
-    credentials["usernames"][group.name] = {
-        "password": group.password,
-        "name": group.name,
+# Authentication setup; the authenticator modifies the credentials in place,
+# so every rerun gets its own dict.
+credentials = {
+    "usernames": {
+        group_name: {"password": password, "name": group_name}
+        for group_name, password in accounts
     }
-roles = {group.name: group.role for group in groups}
+}
 
 authenticator = stauth.Authenticate(
     credentials, "Hausprojekt_verwaltung", "verwaltung123", cookie_expiry_days=30
@@ -85,153 +103,143 @@ def show_dashboard():
     with st.expander(
         "Fonds Übersicht",
     ):
+        col1, col2 = st.columns(2)
+        start = col1.date_input(
+            "Von", value=date.today() - timedelta(days=365), key="fund_plot_start"
+        )
+        end = col2.date_input("Bis", value=date.today(), key="fund_plot_end")
         if st.button("Aktualisieren", key="fund_plot"):
-            fig = plot_funds()
-
-            st.plotly_chart(fig)
+            fig = plot_funds(start, end)
+            if fig:
+                st.plotly_chart(fig)
+
+    with st.expander("Fonds Prognose"):
+        years = st.number_input(
+            "Jahre",
+            min_value=1,
+            max_value=10,
+            value=FORECAST_YEARS,
+            key="forecast_years",
+        )
+        if st.button("Aktualisieren", key="forecast_plot"):
+            st.plotly_chart(plot_fund_forecast(years))
 
 
-def plot_funds():
+def plot_funds(start: date, end: date):
     with Session() as session:
-        confirmed_transactions = (
-            session.query(Transaction).filter(Transaction.confirmed == True).all()
-        )
-        transactions_data = [
-            {
-                "Datum": transaction.date,
-                "Fonds": transaction.fund.name,
-                "Betrag": transaction.amount,
-                "Person": transaction.group.name,
-                "Kommentar": transaction.comment,
-            }
-            for transaction in confirmed_transactions
-        ]
-        funds_data = session.query(Fund).all()
+        ensure_fund_snapshots(session)
+        fund_names = queries.fund_names(session)
+        opening_balances = fund_balances_at(session, start - timedelta(days=1))
+        snapshots = queries.fund_snapshots_between(session, start, end)
+        current_balances = fund_balances_at(session)
         funds_overview = [
             {
                 "Fonds": fund.name,
-                "Aktueller Saldo": sum(
-                    t.amount for t in fund.transactions if t.confirmed
-                ),
+                "Aktueller Saldo": current_balances.get(fund.id, 0.0),
                 "Jährliches Ziel": fund.yearly_target,
             }
-            for fund in funds_data
+            for fund in queries.all_funds(session)
         ]
 
-    df = pd.DataFrame(transactions_data)
+    # Display the overview table
+    st.table(pd.DataFrame(funds_overview))
+
+    snapshots_data = [
+        {"Datum": start, "Fonds": fund_id, "Betrag": 0.0, "Saldo": balance}
+        for fund_id, balance in opening_balances.items()
+    ] + [
+        {"Datum": day, "Fonds": fund_id, "Betrag": amount, "Saldo": balance}
+        for fund_id, day, amount, balance in snapshots
+    ]
+    df = pd.DataFrame(snapshots_data, columns=["Datum", "Fonds", "Betrag", "Saldo"])
+    df = df[df["Fonds"].isin(fund_names.keys())]
+    if df.empty:
+        st.info("Keine bestätigten Transaktionen im gewählten Zeitraum.")
+        return None
+    df["Fonds"] = df["Fonds"].map(fund_names)
     df["Datum"] = pd.to_datetime(df["Datum"])
-    df.sort_values(by="Datum", inplace=True)
-    date_range = pd.date_range(start=df["Datum"].min(), end=df["Datum"].max())
-    funds = df["Fonds"].unique()
-    complete_df = pd.MultiIndex.from_product(
-        [date_range, funds], names=["Datum", "Fonds"]
-    ).to_frame(index=False)
-    df = pd.merge(complete_df, df, on=["Datum", "Fonds"], how="left").sort_values(
-        by=["Datum", "Fonds"]
-    )
-    df.sort_values(by=["Fonds", "Datum"], inplace=True)
-    df["Betrag"].fillna(0, inplace=True)
-    df["Saldo"] = df.groupby("Fonds")["Betrag"].cumsum()
-    df["Person"].fillna(method="ffill", inplace=True)
-    df["Kommentar"].fillna(method="ffill", inplace=True)
+    timeline = change_points(df, "Datum", "Fonds", "Saldo", end=pd.Timestamp(end))
 
     # Create the plot
-    fig = px.area(
-        df,
-        x="Datum",
-        y="Saldo",
-        color="Fonds",
+    fig = step_chart(
+        timeline,
+        "Datum",
+        "Fonds",
+        "Saldo",
         title="Fonds-Salden im Zeitverlauf",
-        hover_data={"Betrag": True, "Person": True, "Kommentar": True},
+        hover_data=["Betrag"],
     )
 
-    # Display the overview table
-    st.table(pd.DataFrame(funds_overview))
-
     return fig
 
 
-def plot_rent_development():
+def plot_fund_forecast(years: int):
     with Session() as session:
-        # Retrieve change logs for expenses and funds
-        expense_logs = session.query(ExpenseChangeLog).all()
-        fund_logs = session.query(FundChangeLog).all()
+        forecast = forecast_funds(session, years)
 
-        # Retrieve current values for expenses and funds
-        current_expenses = session.query(Expense).all()
-        current_funds = session.query(Fund).all()
-
-        # Process expense logs
-        expense_data = [
+    target_months = forecast.target_months()
+    st.table(
+        pd.DataFrame(
             {
-                "date": log.timestamp,
-                "name": log.expense.name,
-                "amount": log.new_amount - (log.previous_amount or 0),
-                "type": "expense",
-                "details": log.details,
+                "Fonds": forecast.fund_names,
+                "Jährliches Ziel": forecast.targets,
+                "Ziel erreicht": [
+                    f"{month:%m/%Y}" if month else "nicht im Zeitraum"
+                    for month in target_months.values()
+                ],
             }
-            for log in expense_logs
-        ]
+        )
+    )
+    uncovered = forecast.uncovered_months()
+    if uncovered:
+        st.warning(
+            "Die geplanten Bareinzahlungen decken die Verteilung auf die Fonds "
+            f"ab {uncovered[0]:%m/%Y} nicht."
+        )
+    giro_shortfall = forecast.giro_shortfall_months()
+    if giro_shortfall:
+        st.warning(
+            "Die geplanten Überweisungen decken die Ausgaben "
+            f"ab {giro_shortfall[0]:%m/%Y} nicht."
+        )
+    return forecast_chart(forecast)
 
-        # Process fund logs
-        fund_data = [
-            {
-                "date": log.timestamp,
-                "name": log.fund.name,
-                "amount": log.new_amount - (log.previous_amount or 0),
-                "type": "fund",
-                "details": log.details,
-            }
-            for log in fund_logs
-            if log.fund is not None
-        ]
 
-        # Combine data
-        data = expense_data + fund_data
-        df = pd.DataFrame(data)
+def plot_rent_development():
+    with Session() as session:
+        rent = rent_timeline(session)
 
         # Display overview of changes in a scrollable table
         st.subheader("Übersicht der Änderungen")
-        st.dataframe(df[["date", "name", "amount", "details"]])
-
-        # Ensure data points for all expenses and funds at each timestamp
-        all_names = [expense.name for expense in current_expenses] + [
-            fund.name for fund in current_funds
-        ]
-        date_range = pd.date_range(
-            start=df["date"].min(), end=df["date"].max(), inclusive="both"
-        )
-        df["date"] = df["date"].dt.normalize()
-        df = df.groupby(["date", "name"]).sum().reindex()
-
-        complete_df = pd.MultiIndex.from_product(
-            [date_range, all_names], names=["date", "name"]
-        ).to_frame(index=False)
-        df = pd.merge(complete_df, df, on=["date", "name"], how="left").sort_values(
-            by=["date", "name"]
+        st.dataframe(rent.changes)
+
+        # One row per change of the cumulative monthly amount
+        timeline = change_points(
+            rent.levels,
+            "date",
+            "name",
+            "cumulative_amount",
+            end=pd.Timestamp.today().normalize(),
         )
 
-        # Fill missing values
-        df["amount"].fillna(0, inplace=True)
-        # Calculate cumulative sum per month
-        df["cumulative_amount"] = df.groupby(["name"])["amount"].cumsum() / 12
-
         # Display current total rent per month
         st.subheader("Aktuelle Gesamtmiete pro Monat")
         # Calculate current total rent per month
-        current_total_rent = df.loc[
-            df["date"] == df["date"].max(), "cumulative_amount"
-        ].sum()
+        totals = house_totals(session)
+        current_total_rent = (
+            (totals["total_yearly_expenses"] or 0)
+            + (totals["total_yearly_target"] or 0)
+        ) / 12
         st.write(
             f"Die aktuelle Gesamtmiete pro Monat beträgt: {current_total_rent:.2f} EUR"
         )
 
         # Plot using Plotly
-        fig = px.area(
-            df,
-            x="date",
-            y="cumulative_amount",
-            color="name",
+        fig = step_chart(
+            timeline,
+            "date",
+            "name",
+            "cumulative_amount",
             title="Entwicklung der Miete",
         )
 
@@ -319,7 +327,7 @@ def show_user_profile(user: Group):
         st.write(f"Bar: {current_cash}, Überweisung: {current_giro}")
         st.subheader("Persönliche Daten")
 
-        group = session.query(Group).filter(Group.name == user.name).first()
+        group = queries.group_by_name(session, user.name)
         if group:
             new_name = st.text_input("Name", value=group.name)
             new_password = st.text_input("Passwort", type="password")
@@ -373,11 +381,13 @@ Diese Berechnung berücksichtigt die unterschiedlichen Bedürfnisse der Mitglied
                     group.password = new_password
                 group.income = new_income
                 group.last_updated = datetime.now()
+                bump_data_version(session)
+                bump_data_version(session, ACCOUNTS_VERSION_KEY)
                 session.commit()
                 st.success("Profil aktualisiert!")
 
-            all_rooms = session.query(Room).all()
-            all_categories = session.query(PeopleCategory).all()
+            all_rooms = queries.rooms_with_tenants(session)
+            all_categories = queries.all_categories(session)
             with st.form("Räume"):
                 selected_rooms = st.multiselect(
                     "Gemietete Räume",
@@ -388,9 +398,8 @@ Diese Berechnung berücksichtigt die unterschiedlichen Bedürfnisse der Mitglied
 
                 if st.form_submit_button("Speichern"):
                     selected_room_ids = [room.id for room in selected_rooms]
-                    group.rooms = (
-                        session.query(Room).where(Room.id.in_(selected_room_ids)).all()
-                    )
+                    group.rooms = queries.rooms_by_ids(session, selected_room_ids)
+                    bump_data_version(session)
                     session.commit()
                     st.success(f"Räume aktualisiert!")
 
@@ -427,6 +436,7 @@ Diese Berechnung berücksichtigt die unterschiedlichen Bedürfnisse der Mitglied
                                 category_id=category_id, group_id=group.id
                             )
                             session.add(new_person)
+                    bump_data_version(session)
                     session.commit()
                     st.success("Mitglieder aktualisiert!")
                     st.rerun()
@@ -448,8 +458,8 @@ def room_management(session):
     with st.expander("Räume"):
         # Rooms Management
         st.subheader("Räume")
-        rooms = session.query(Room).all()
-        groups = session.query(Group).all()
+        rooms = queries.rooms_with_tenants(session)
+        groups = queries.all_groups(session)
 
         st.write("Aktuelle Räume:")
         room_data = [
@@ -467,6 +477,7 @@ def room_management(session):
             if add_room_submit and new_room_name:
                 new_room = Room(name=new_room_name, area=new_room_area)
                 session.add(new_room)
+                bump_data_version(session)
                 session.commit()
                 st.success("Neuer Raum hinzugefügt!")
 
@@ -480,9 +491,7 @@ def room_management(session):
         )
 
         if selected_room_id:
-            selected_room: Room = (
-                session.query(Room).filter(Room.id == selected_room_id[0]).first()
-            )
+            selected_room: Room = session.get(Room, selected_room_id[0])
             with st.form("edit_room_form"):
                 edit_room_name = st.text_input("Raumname", value=selected_room.name)
                 edit_room_area = st.number_input(
@@ -505,15 +514,15 @@ def room_management(session):
                     selected_room.name = edit_room_name
                     selected_room.area = edit_room_area
                     selected_tenant_ids = [tenant.id for tenant in selected_tenants]
-                    selected_room.tenants = (
-                        session.query(Group)
-                        .where(Group.id.in_(selected_tenant_ids))
-                        .all()
+                    selected_room.tenants = queries.groups_by_ids(
+                        session, selected_tenant_ids
                     )
+                    bump_data_version(session)
                     session.commit()
                     st.success("Raum aktualisiert!")
                 if delete_room_submit:
                     session.delete(selected_room)
+                    bump_data_version(session)
                     session.commit()
                     st.success("Raum gelöscht!")
 
@@ -534,22 +543,16 @@ def room_management(session):
                 )
 
                 if add_group_to_room_submit:
-                    selected_group = (
-                        session.query(Group)
-                        .filter(Group.id == selected_group_id[0])
-                        .first()
-                    )
+                    selected_group = session.get(Group, selected_group_id[0])
                     selected_room.tenants.append(selected_group)
+                    bump_data_version(session)
                     session.commit()
                     st.success("Gruppe zum Raum hinzugefügt!")
 
                 if remove_group_from_room_submit:
-                    selected_group = (
-                        session.query(Group)
-                        .filter(Group.id == selected_group_id[0])
-                        .first()
-                    )
+                    selected_group = session.get(Group, selected_group_id[0])
                     selected_room.tenants.remove(selected_group)
+                    bump_data_version(session)
                     session.commit()
                     st.success("Gruppe aus dem Raum entfernt!")
 
@@ -559,7 +562,7 @@ def people_category(session):
     with st.expander("Personenekategorien"):
 
         st.subheader("Personenkategorien")
-        categories = session.query(PeopleCategory).all()
+        categories = queries.all_categories(session)
 
         st.write("Aktuelle Kategorien:")
         category_data = [
@@ -589,6 +592,7 @@ def people_category(session):
                     head_count=new_category_head_count,
                 )
                 session.add(new_category)
+                bump_data_version(session)
                 session.commit()
                 st.success("Neue Kategorie hinzugefügt!")
 
@@ -602,11 +606,7 @@ def people_category(session):
         )
 
         if selected_category_id:
-            selected_category = (
-                session.query(PeopleCategory)
-                .filter(PeopleCategory.id == selected_category_id[0])
-                .first()
-            )
+            selected_category = session.get(PeopleCategory, selected_category_id[0])
             with st.form("edit_category_form"):
                 edit_category_name = st.text_input(
                     "Kategorie Name", value=selected_category.name
@@ -630,12 +630,18 @@ def people_category(session):
                     selected_category.name = edit_category_name
                     selected_category.monthly_base_need = edit_category_income
                     selected_category.head_count = edit_category_head_count
+                    bump_data_version(session)
                     session.commit()
                     st.success("Kategorie aktualisiert!")
                 if delete_category_submit:
                     session.delete(selected_category)
-                    session.commit()
-                    st.success("Kategorie gelöscht!")
+                    bump_data_version(session)
+                    try:
+                        session.commit()
+                        st.success("Kategorie gelöscht!")
+                    except IntegrityError:
+                        session.rollback()
+                        st.error("Die Kategorie ist noch Personen zugeordnet.")
 
 
 def evaluate_bids_and_start_round():
@@ -643,12 +649,7 @@ def evaluate_bids_and_start_round():
 
     with Session() as session:
         # Check for existing open bidding round
-        bidding_status: BiddingStatus = (
-            session.query(BiddingStatus)
-            .filter(BiddingStatus.status == "open")
-            .order_by(BiddingStatus.created_at.desc())
-            .first()
-        )
+        bidding_status: BiddingStatus = queries.latest_bidding_status(session, "open")
 
         if bidding_status:
             st.subheader("Aktuelle Bietrunde")
@@ -656,13 +657,9 @@ def evaluate_bids_and_start_round():
             total_needed = bidding_status.total_amount_needed
             total_pledged = bidding_status.total_amount_pledged
 
-            active_groups = session.query(Group).filter(Group.active == True).all()
+            active_groups = queries.active_groups(session)
             active_groups_count = len(active_groups)
-            submitted_bids = (
-                session.query(Bid)
-                .filter(Bid.bidding_status_id == bidding_status.id)
-                .all()
-            )
+            submitted_bids = queries.bids_for_round(session, bidding_status.id)
             submitted_bids_count = len(submitted_bids)
             groups_with_bids = {bid.group_id for bid in submitted_bids}
             groups_missing_bids = [
@@ -692,7 +689,6 @@ def evaluate_bids_and_start_round():
 
                 if accept_button:
                     bidding_status.status = "accepted"
-                    session.commit()
                     bids_to_rent(bidding_status, session)
                 elif decline_button:
                     bidding_status.status = "declined"
@@ -709,12 +705,9 @@ def evaluate_bids_and_start_round():
             st.header("Bietrunde starten")
             with st.form("start_bidding"):
 
-                total_yearly_expenses = session.query(
-                    func.sum(Expense.yearly_amount)
-                ).scalar()
-                total_yearly_target = session.query(
-                    func.sum(Fund.yearly_target)
-                ).scalar()
+                totals = house_totals(session)
+                total_yearly_expenses = totals["total_yearly_expenses"]
+                total_yearly_target = totals["total_yearly_target"]
                 month_start = pd.Timestamp.today().replace(day=1) + pd.DateOffset(
                     months=1
                 )
@@ -776,14 +769,9 @@ Diese drei Berechnungen bieten verschiedene Ansätze zur fairen Verteilung der M
         # Check if all active groups were updated in the last month
         one_month_ago = datetime.now() - pd.Timedelta(days=30)
         active_groups_updated = (
-            session.query(Group)
-            .filter(Group.active, Group.last_updated < one_month_ago)
-            .count()
-            == 0
-        )
-        missing_income = (
-            session.query(Group).filter(Group.active, Group.income == None).count() != 0
+            queries.active_groups_not_updated_since(session, one_month_ago) == 0
         )
+        missing_income = queries.active_groups_without_income(session) != 0
 
         if missing_income or not active_groups_updated:
             st.warning(
@@ -791,7 +779,7 @@ Diese drei Berechnungen bieten verschiedene Ansätze zur fairen Verteilung der M
             )
             return
 
-        group = session.query(Group).filter(Group.name == user.name).first()
+        group = queries.group_by_name(session, user.name)
         if group:
             rent_calculation = calculate_rent_for_group(group.id)
             st.write(
@@ -807,27 +795,18 @@ Diese drei Berechnungen bieten verschiedene Ansätze zur fairen Verteilung der M
     st.header("Mietgebot abgeben")
 
     with Session() as session:
-        group = session.query(Group).filter(Group.name == user.name).first()
+        group = queries.group_by_name(session, user.name)
         if group:
-            current_bidding_status: BiddingStatus = (
-                session.query(BiddingStatus)
-                .filter(BiddingStatus.status == "open")
-                .first()
-            )
+            current_bidding_status: BiddingStatus = queries.open_bidding_status(session)
             if not current_bidding_status:
                 st.warning("Keine offene Bietrunde verfügbar.")
                 return
 
             # Retrieve the last declined bidding round
-            last_declined_bidding_status = (
-                session.query(BiddingStatus)
-                .filter(BiddingStatus.status == "declined")
-                .filter(BiddingStatus.period_end == current_bidding_status.period_end)
-                .filter(
-                    BiddingStatus.period_start == current_bidding_status.period_start
-                )
-                .order_by(BiddingStatus.created_at.desc())
-                .first()
+            last_declined_bidding_status = queries.last_declined_bidding_status(
+                session,
+                current_bidding_status.period_start,
+                current_bidding_status.period_end,
             )
 
             if last_declined_bidding_status:
@@ -842,25 +821,15 @@ Diese drei Berechnungen bieten verschiedene Ansätze zur fairen Verteilung der M
                     )
 
                 # Retrieve the previous bid amount for the group
-                previous_bid = (
-                    session.query(Bid)
-                    .filter(
-                        Bid.group_id == group.id,
-                        Bid.bidding_status_id == last_declined_bidding_status.id,
-                    )
-                    .first()
+                previous_bid = queries.bid_of_group(
+                    session, group.id, last_declined_bidding_status.id
                 )
                 previous_bid_amount = previous_bid.amount if previous_bid else 0.0
             else:
                 previous_bid_amount = 0.0
 
-            existing_bid = (
-                session.query(Bid)
-                .filter(
-                    Bid.group_id == group.id,
-                    Bid.bidding_status_id == current_bidding_status.id,
-                )
-                .first()
+            existing_bid = queries.bid_of_group(
+                session, group.id, current_bidding_status.id
             )
             if existing_bid:
                 st.warning(
@@ -894,11 +863,7 @@ Diese drei Berechnungen bieten verschiedene Ansätze zur fairen Verteilung der M
                 current_bidding_status.total_amount_pledged = total_pledged
                 session.commit()
                 # Check if all active groups have submitted a bid
-                active_groups_count = (
-                    session.query(func.count(Group.id))
-                    .filter(Group.active == True)
-                    .scalar()
-                )
+                active_groups_count = queries.active_group_count(session)
                 submitted_bids_count = len(current_bidding_status.bids)
 
                 if submitted_bids_count >= active_groups_count:
@@ -934,14 +899,15 @@ def show_group_management():
     st.subheader("Bezugsgruppenübersicht")
     with st.form("Personenübersicht"):
         with Session() as session:
-            groups = session.query(Group).filter(Group.active == True).all()
+            groups = queries.active_groups(session, with_details=True)
+            rent_calculations = calculate_rent_for_all_groups()
 
             # Prepare data for st.data_editor
             data = []
             for group in groups:
                 members = ", ".join([member.category.name for member in group.members])
                 rooms = ", ".join([room.name for room in group.rooms])
-                rent_calcs = calculate_rent_for_group(group.id)
+                rent_calcs = rent_calculations[group.id]
                 data.append(
                     {
                         "ID": group.id,
@@ -977,11 +943,13 @@ def show_group_management():
 
         if button:
             for index, row in edited_df.iterrows():
-                group = session.query(Group).filter(Group.id == row["ID"]).first()
+                group = session.get(Group, row["ID"])
                 group.name = row["Name"]
                 group.role = row["Rolle"]
                 group.income = row["Einkommen"]
                 group.password = row["Passwort"]
+                bump_data_version(session)
+                bump_data_version(session, ACCOUNTS_VERSION_KEY)
                 session.commit()
             st.success("Änderungen gespeichert!")
 
@@ -991,8 +959,10 @@ def show_group_management():
         if st.form_submit_button("Gruppe deaktivieren"):
             for index, row in edited_df.iterrows():
                 if row["ID"] in df["ID"].values:
-                    group = session.query(Group).filter(Group.id == row["ID"]).first()
+                    group = session.get(Group, row["ID"])
                     group.active = False
+                    bump_data_version(session)
+                    bump_data_version(session, ACCOUNTS_VERSION_KEY)
                     session.commit()
             st.success("Personen deaktiviert!")
 
@@ -1036,7 +1006,7 @@ def show_expenses_management():
     # List and manage existing expenses
     st.subheader("Bestehende Ausgaben")
     with Session() as session:
-        expenses = session.query(Expense).all()
+        expenses = queries.all_expenses(session)
 
         # Prepare data for st.data_editor
         data = []
@@ -1068,7 +1038,7 @@ def show_expenses_management():
             update_button = st.form_submit_button("Änderungen speichern")
         if update_button:
             for index, row in edited_df.iterrows():
-                expense = session.query(Expense).filter(Expense.id == row["ID"]).first()
+                expense = session.get(Expense, row["ID"])
                 if expense:
                     old_amount = expense.yearly_amount
                     expense.name = row["Name"]
@@ -1105,11 +1075,7 @@ def show_expenses_management():
             confirm_delete_button = st.button("Löschen bestätigen")
 
             if confirm_delete_button:
-                expense_to_delete = (
-                    session.query(Expense)
-                    .filter(Expense.id == selected_expense_id)
-                    .first()
-                )
+                expense_to_delete = session.get(Expense, selected_expense_id)
                 if expense_to_delete:
                     log_change(
                         session,
@@ -1121,6 +1087,7 @@ def show_expenses_management():
                         "expense",
                     )
                     session.delete(expense_to_delete)
+                    bump_data_version(session)
                     session.commit()
                     st.success(f"Ausgabe {expense_to_delete.name} gelöscht!")
 
@@ -1131,6 +1098,10 @@ def show_funds_management(user: Group):
         show_distribution(user)
     with st.expander("Einzahlungen prüfen"):
         show_deposits(user.role, user.name)
+    with st.expander("Kontoauszug importieren"):
+        show_statement_import()
+    with st.expander("Daten exportieren"):
+        show_export()
     with st.expander("Ausgaben"):
         show_expenses(role, current_user)
     with st.expander("Kassentransaktionen bestätigen"):
@@ -1154,10 +1125,8 @@ def show_funds_management(user: Group):
             button = st.form_submit_button("Übertragung durchführen")
         if button:
             with Session() as session:
-                from_fund = (
-                    session.query(Fund).filter(Fund.name == from_fund_name).first()
-                )
-                to_fund = session.query(Fund).filter(Fund.name == to_fund_name).first()
+                from_fund = queries.fund_by_name(session, from_fund_name)
+                to_fund = queries.fund_by_name(session, to_fund_name)
                 transfer_funds(from_fund.id, to_fund.id, transfer_amount, user.id)
                 st.success(
                     f"{transfer_amount} EUR von {from_fund_name} zu {to_fund_name} übertragen!"
@@ -1167,7 +1136,7 @@ def show_funds_management(user: Group):
         with Session() as session:
             # Prepare data for st.data_editor
             data = []
-            for fund in funds:
+            for fund in queries.all_funds(session):
                 if fund.name != "Einzahlungsfonds":
                     data.append(
                         {
@@ -1193,7 +1162,7 @@ def show_funds_management(user: Group):
                 update_button = st.form_submit_button("Änderungen speichern")
             if update_button:
                 for index, row in edited_df.iterrows():
-                    fund = session.query(Fund).filter(Fund.id == row["ID"]).first()
+                    fund = session.get(Fund, row["ID"])
                     if fund:
                         old_yearly_target = fund.yearly_target
                         fund.name = row["Name"]
@@ -1241,14 +1210,8 @@ def show_funds_management(user: Group):
                 confirm_delete_button = st.button("Löschen bestätigen")
 
                 if confirm_delete_button:
-                    fund_to_delete = (
-                        session.query(Fund).filter(Fund.id == selected_fund_id).first()
-                    )
-                    transfer_to_fund = (
-                        session.query(Fund)
-                        .filter(Fund.id == transfer_to_fund_id)
-                        .first()
-                    )
+                    fund_to_delete = session.get(Fund, selected_fund_id)
+                    transfer_to_fund = session.get(Fund, transfer_to_fund_id)
                     if fund_to_delete and transfer_to_fund:
                         log_change(
                             session,
@@ -1308,6 +1271,8 @@ def show_deposits(role: Literal["admin", "user"], name: str):
                 )
     else:
         st.write("Keine fehlenden Einzahlungen.")
+    if role == "admin":
+        show_schedule_issues()
 
     group_name = (
         st.selectbox("Person", [group.name for group in groups])
@@ -1331,29 +1296,20 @@ def show_deposits(role: Literal["admin", "user"], name: str):
     )
 
     with Session() as session:
-        group = session.query(Group).filter(Group.name == group_name).first()
+        group = queries.group_by_name(session, group_name)
         month_date = date(year, month, 1)
-        monthly_amount = (
-            session.query(MonthlyCash)
-            .filter(
-                MonthlyCash.group_id == group.id,
-                MonthlyCash.start_date <= month_date,
-                MonthlyCash.end_date >= month_date,
-            )
-            .first()
-        )
+        amount = resolve_schedules(
+            session, month_date, month_date, [group.id], schedules=("cash",)
+        ).due(group.id, month_date)
 
-        if monthly_amount:
-            amount = monthly_amount.amount
+        if amount is not None:
             st.write(f"Betrag für {group_name} im {month}/{year}: {amount} EUR")
             deposit_amount = st.number_input(
                 "Einzahlungsbetrag", min_value=0.0, value=amount, key="deposit_amount"
             )
 
             if st.button("Einzahlung bestätigen"):
-                deposit_fund = (
-                    session.query(Fund).filter(Fund.name == "Einzahlungsfonds").first()
-                )
+                deposit_fund = queries.fund_by_name(session, "Einzahlungsfonds")
                 add_transaction(
                     deposit_fund.id,
                     deposit_amount,
@@ -1366,6 +1322,107 @@ def show_deposits(role: Literal["admin", "user"], name: str):
                 )
 
 
+SCHEDULE_ISSUE_LABELS = {"overlap": "Überschneidung", "gap": "Lücke"}
+
+
+def show_schedule_issues():
+    issues = schedule_issues()
+    if not issues:
+        return
+    group_names = {group.id: group.name for group in groups}
+    st.warning(
+        "Die Zahlungspläne sind nicht eindeutig. Bei Überschneidungen gilt "
+        "der zuletzt begonnene Plan."
+    )
+    for issue in issues:
+        st.write(
+            f"{group_names.get(issue.group_id, issue.group_id)}, "
+            f"{'Bar' if issue.schedule == 'cash' else 'Überweisung'}: "
+            f"{SCHEDULE_ISSUE_LABELS[issue.kind]} vom {issue.start:%d.%m.%Y} "
+            f"bis {issue.end:%d.%m.%Y}"
+        )
+
+
+def show_statement_import():
+    st.info(
+        """
+        CAMT.053-Datei (.xml) oder CSV-Export mit den Spalten Buchungstag, Name,
+        Verwendungszweck und Betrag. Gutschriften werden der Gruppe zugeordnet,
+        deren Name im Verwendungszweck oder im Namen steht, und müssen danach
+        noch bestätigt werden. Bereits importierte Buchungen werden übersprungen.
+        """
+    )
+    with st.form("statement_import"):
+        statement = st.file_uploader("Kontoauszug", type=["csv", "xml"])
+        if st.form_submit_button("Importieren") and statement is not None:
+            try:
+                result = import_statement(read_statement(statement, statement.name))
+            except STATEMENT_ERRORS as error:
+                st.error(f"Kontoauszug konnte nicht gelesen werden: {error}")
+                return
+            st.success(
+                f"{result.imported} Einzahlungen importiert, "
+                f"{result.duplicates} bereits vorhanden."
+            )
+            if result.unmatched:
+                st.warning(
+                    f"{result.unmatched} Gutschriften keiner Gruppe zugeordnet, "
+                    "bitte von Hand eintragen:"
+                )
+                st.dataframe(
+                    pd.DataFrame(
+                        [line.to_dict() for line in result.unmatched_lines]
+                    ).rename(
+                        columns={
+                            "date": "Datum",
+                            "amount": "Betrag",
+                            "name": "Name",
+                            "reference": "Verwendungszweck",
+                        }
+                    ),
+                    hide_index=True,
+                )
+
+
+EXPORT_LABELS = {
+    "transactions": "Transaktionen",
+    "monthly_cash": "Monatliche Barzahlungen",
+    "monthly_giro": "Monatliche Überweisungen",
+    "bids": "Gebote",
+    "fund_changes": "Änderungen an Fonds",
+    "expense_changes": "Änderungen an Ausgaben",
+}
+
+
+def show_export():
+    with st.form("export"):
+        table = st.selectbox(
+            "Tabelle",
+            list(EXPORT_LABELS),
+            format_func=EXPORT_LABELS.get,
+            key="export_table",
+        )
+        file_format = st.radio(
+            "Format", ["csv", "parquet"], horizontal=True, key="export_format"
+        )
+        start = st.date_input("Von", value=None, key="export_start")
+        end = st.date_input("Bis", value=None, key="export_end")
+        submitted = st.form_submit_button("Exportieren")
+
+    if submitted:
+        # The rows are streamed into the file. It is only kept for this run,
+        # the download button holds the one copy that is served.
+        file = io.BytesIO()
+        export_table(table, file, file_format, start, end)
+        file_name = f"{table}.{file_format}"
+        st.download_button(
+            f"{file_name} herunterladen",
+            data=file,
+            file_name=file_name,
+            mime="text/csv" if file_format == "csv" else "application/octet-stream",
+        )
+
+
 def show_distribution(user: Group):
     with st.popover(
         "# Einzahlungen Verteilen &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; ℹ",
@@ -1379,9 +1436,7 @@ def show_distribution(user: Group):
         )
 
     with Session() as session:
-        deposit_fund = (
-            session.query(Fund).filter(Fund.name == "Einzahlungsfonds").first()
-        )
+        deposit_fund = queries.fund_by_name(session, "Einzahlungsfonds")
         st.write(f"{deposit_fund.current_balance} € im Einzahlungsfonds.")
         if st.button("Verteilung durchführen"):
             result = distribute_funds(user.id)
@@ -1410,7 +1465,7 @@ def show_expenses(role: Literal["admin", "user"], user: Group):
         submit_button = st.form_submit_button(label="Ausgabe bestätigen")
     if submit_button:
         with Session() as session:
-            fund = session.query(Fund).filter(Fund.name == fund_name).first()
+            fund = queries.fund_by_name(session, fund_name)
             add_transaction(
                 fund.id, -expense_amount, expense_date, user.id, comment=expense_comment
             )
@@ -1419,6 +1474,93 @@ def show_expenses(role: Literal["admin", "user"], user: Group):
             )
 
 
+def show_confirmation_rows(unconfirmed_transactions):
+    # Group transactions by transfer_id
+    grouped_transactions = {}
+    for transaction in unconfirmed_transactions:
+        if transaction.transfer_id:
+            if transaction.transfer_id not in grouped_transactions:
+                grouped_transactions[transaction.transfer_id] = []
+            grouped_transactions[transaction.transfer_id].append(transaction)
+        else:
+            grouped_transactions[transaction.id] = [transaction]
+
+    # Create table headers
+    cols = st.columns([1, 1, 1, 1, 1, 1])
+    cols[0].write("Topf")
+    cols[1].write("Person")
+    cols[2].write("Kommentar")
+    cols[3].write("Betrag")
+    cols[4].write("Bestätigen")
+    cols[5].write("Löschen")
+
+    for transfer_id, transactions in grouped_transactions.items():
+        for transaction in transactions:
+            cols = st.columns([1, 1, 1, 1, 1, 1])
+            cols[0].write(transaction.fund_name)
+            cols[1].write(transaction.group_name)
+            cols[2].write(transaction.comment)
+            cols[3].write(f"{transaction.amount} EUR")
+
+            with cols[4]:
+                if st.button("Bestätigen", key=f"confirm_{transaction.id}"):
+                    confirm_transaction(transaction.id)
+                    st.success(
+                        f"Transaktion {transaction.id} bestätigt!"
+                        if not transaction.transfer_id
+                        else f"Transfer {transfer_id} bestätigt!"
+                    )
+                    st.rerun()
+
+            with cols[5]:
+                if st.button("Löschen", key=f"delete_{transaction.id}"):
+                    delete_transaction(transaction.id)
+                    st.success(
+                        f"Transaktion {transaction.id} gelöscht!"
+                        if not transaction.transfer_id
+                        else f"Transfer {transfer_id} gelöscht!"
+                    )
+                    st.rerun()
+
+
+def show_confirmation_multiselect(unconfirmed_transactions):
+    df = pd.DataFrame(
+        [
+            {
+                "ID": transaction.id,
+                "Auswählen": False,
+                "Topf": transaction.fund_name,
+                "Person": transaction.group_name,
+                "Kommentar": transaction.comment,
+                "Betrag": transaction.amount,
+                "Transfer": transaction.transfer_id,
+            }
+            for transaction in unconfirmed_transactions
+        ]
+    )
+    with st.form("confirm_selected"):
+        edited_df = st.data_editor(
+            df,
+            num_rows="fixed",
+            key="confirm_editor",
+            disabled=("Topf", "Person", "Kommentar", "Betrag", "Transfer"),
+            hide_index=True,
+            column_config={
+                "ID": None,
+                "Betrag": st.column_config.NumberColumn(format="%.2f EUR"),
+            },
+        )
+        st.caption("Bei Transfers werden alle zugehörigen Buchungen bestätigt.")
+        if st.form_submit_button("Ausgewählte bestätigen"):
+            selected_ids = edited_df.loc[edited_df["Auswählen"], "ID"].tolist()
+            if selected_ids:
+                confirmed = confirm_transactions(selected_ids)
+                st.success(f"{confirmed} Transaktionen bestätigt!")
+                st.rerun()
+            else:
+                st.warning("Keine Transaktion ausgewählt.")
+
+
 def show_confirmation():
     with st.popover(
         "# Bestätigungen &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; &nbsp; ℹ",
@@ -1432,67 +1574,124 @@ def show_confirmation():
         )
 
     with Session() as session:
-        unconfirmed_transactions = (
-            session.query(Transaction).filter(Transaction.confirmed == False).all()
-        )
+        unconfirmed_transactions = queries.pending_transactions(session)
 
         if unconfirmed_transactions:
-            # Group transactions by transfer_id
-            grouped_transactions = {}
-            for transaction in unconfirmed_transactions:
-                if transaction.transfer_id:
-                    if transaction.transfer_id not in grouped_transactions:
-                        grouped_transactions[transaction.transfer_id] = []
-                    grouped_transactions[transaction.transfer_id].append(transaction)
-                else:
-                    grouped_transactions[transaction.id] = [transaction]
-
-            # Create table headers
             st.markdown("### Unbestätigte Transaktionen")
-            cols = st.columns([1, 1, 1, 1, 1, 1])
-            cols[0].write("Topf")
-            cols[1].write("Person")
-            cols[2].write("Kommentar")
-            cols[3].write("Betrag")
-            cols[4].write("Bestätigen")
-            cols[5].write("Löschen")
-
-            for transfer_id, transactions in grouped_transactions.items():
-                for transaction in transactions:
-                    cols = st.columns([1, 1, 1, 1, 1, 1])
-                    cols[0].write(transaction.fund.name)
-                    cols[1].write(transaction.group.name)
-                    cols[2].write(transaction.comment)
-                    cols[3].write(f"{transaction.amount} EUR")
-
-                    with cols[4]:
-                        if st.button("Bestätigen", key=f"confirm_{transaction.id}"):
-                            confirm_transaction(transaction.id)
-                            st.success(
-                                f"Transaktion {transaction.id} bestätigt!"
-                                if not transaction.transfer_id
-                                else f"Transfer {transfer_id} bestätigt!"
-                            )
-                            st.experimental_rerun()
-
-                    with cols[5]:
-                        if st.button("Löschen", key=f"delete_{transaction.id}"):
-                            for trans in transactions:
-                                session.delete(trans)
-                            session.commit()
-                            st.success(
-                                f"Transaktion {transaction.id} gelöscht!"
-                                if not transaction.transfer_id
-                                else f"Transfer {transfer_id} gelöscht!"
-                            )
-                            st.experimental_rerun()
+            if st.toggle("Mehrfachauswahl", key="confirm_multiselect"):
+                show_confirmation_multiselect(unconfirmed_transactions)
+            else:
+                show_confirmation_rows(unconfirmed_transactions)
         else:
             st.write("Keine unbestätigten Transaktionen.")
 
 
+TRANSACTIONS_PAGE_SIZE = 50
+
+
+def show_transactions(role: Literal["admin", "user"], user: Group):
+    st.header("Transaktionen")
+    fund_names = {fund.id: fund.name for fund in funds}
+    group_names = {group.id: group.name for group in groups}
+
+    col1, col2, col3 = st.columns(3)
+    fund_id = col1.selectbox(
+        "Fonds",
+        [None, *fund_names],
+        format_func=lambda fund_id: fund_names.get(fund_id, "Alle"),
+        key="history_fund",
+    )
+    if role == "admin":
+        group_id = col2.selectbox(
+            "Gruppe",
+            [None, *group_names],
+            format_func=lambda group_id: group_names.get(group_id, "Alle"),
+            key="history_group",
+        )
+    else:
+        group_id = user.id
+    status = col3.selectbox(
+        "Status", ["Alle", "Bestätigt", "Offen"], key="history_status"
+    )
+    col1, col2 = st.columns(2)
+    start = col1.date_input("Von", value=None, key="history_start")
+    end = col2.date_input("Bis", value=None, key="history_end")
+    filters = {
+        "fund_id": fund_id,
+        "group_id": group_id,
+        "confirmed": {"Alle": None, "Bestätigt": True, "Offen": False}[status],
+        "start": start,
+        "end": end,
+    }
+
+    # Each page starts after the (date, id) of the last row of the page
+    # before; the stack holds these keys for going back.
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_pages = [None]
+    pages = st.session_state.history_pages
+
+    with Session() as session:
+        rows = queries.transactions_page(
+            session, TRANSACTIONS_PAGE_SIZE + 1, before=pages[-1], **filters
+        )
+    has_older = len(rows) > TRANSACTIONS_PAGE_SIZE
+    rows = rows[:TRANSACTIONS_PAGE_SIZE]
+
+    if rows:
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "Datum": row.date,
+                        "Fonds": row.fund_name,
+                        "Gruppe": row.group_name,
+                        "Betrag": row.amount,
+                        "Kommentar": row.comment,
+                        "Bestätigt": row.confirmed,
+                    }
+                    for row in rows
+                ]
+            ),
+            hide_index=True,
+        )
+    else:
+        st.info("Keine Transaktionen gefunden.")
+
+    col1, col2, col3 = st.columns(3)
+    if col1.button("Neuere", disabled=len(pages) == 1, key="history_newer"):
+        pages.pop()
+        st.rerun()
+    col2.write(f"Seite {len(pages)}")
+    if col3.button("Ältere", disabled=not has_older, key="history_older"):
+        pages.append((rows[-1].date, rows[-1].id))
+        st.rerun()
+
+
+def show_debug_panel(tab_profile):
+    with st.sidebar.expander(f"Messwerte: {tab_profile.name}", expanded=True):
+        cols = st.columns(2)
+        cols[0].metric("SQL-Abfragen", tab_profile.query_count)
+        cols[1].metric("SQL-Zeit", f"{tab_profile.sql_seconds * 1000:.1f} ms")
+        cols = st.columns(2)
+        cols[0].metric("Darstellung", f"{tab_profile.render_seconds * 1000:.1f} ms")
+        cols[1].metric("Gesamt", f"{tab_profile.total_seconds * 1000:.1f} ms")
+        if tab_profile.slowest:
+            st.write("Langsamste Abfragen")
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        {"ms": round(seconds * 1000, 2), "Abfrage": statement}
+                        for seconds, statement in tab_profile.slowest
+                    ]
+                ),
+                hide_index=True,
+            )
+
+
 if authentication_status:
     with Session() as session:
-        current_user = session.query(Group).filter(Group.name == name).first()
+        current_user = queries.group_by_name(session, name)
 
     role = roles[name]
     with st.sidebar:
@@ -1505,6 +1704,7 @@ if authentication_status:
         "Kosten verwalten",
         "Bietrunde",
         "Räume und Bewohner*innen",
+        "Transaktionen",
         "Mein Profil",
     ]
     user_tabs = [
@@ -1513,30 +1713,37 @@ if authentication_status:
         "Einzahlungen",
         "Ausgabenrückerstatung",
         "Mietgebot abgeben",
+        "Transaktionen",
     ]
 
     tabs = admin_tabs if role == "admin" else user_tabs
 
     selected_tab = st.sidebar.radio("Registerkarte auswählen", tabs)
 
-    if selected_tab == "Einzahlungen":
-        show_deposits(role, name)
-    elif selected_tab == "Ausgabenrückerstatung":
-        show_expenses(role, current_user)
-    elif selected_tab == "Bargeldverwaltung" and role == "admin":
-        show_funds_management(current_user)
-    elif selected_tab == "Mein Profil":
-        show_user_profile(current_user)
-    elif selected_tab == "Räume und Bewohner*innen":
-        manage_rooms_and_categories()
-    elif selected_tab == "Kosten verwalten":
-        show_expenses_management()
-    elif selected_tab == "Bietrunde":
-        evaluate_bids_and_start_round()
-    elif selected_tab == "Mietgebot abgeben":
-        submit_rent_bid(current_user)
-    else:
-        show_dashboard()
+    with profile_tab(selected_tab, name) as tab_profile:
+        if selected_tab == "Einzahlungen":
+            show_deposits(role, name)
+        elif selected_tab == "Ausgabenrückerstatung":
+            show_expenses(role, current_user)
+        elif selected_tab == "Bargeldverwaltung" and role == "admin":
+            show_funds_management(current_user)
+        elif selected_tab == "Mein Profil":
+            show_user_profile(current_user)
+        elif selected_tab == "Räume und Bewohner*innen":
+            manage_rooms_and_categories()
+        elif selected_tab == "Kosten verwalten":
+            show_expenses_management()
+        elif selected_tab == "Bietrunde":
+            evaluate_bids_and_start_round()
+        elif selected_tab == "Mietgebot abgeben":
+            submit_rent_bid(current_user)
+        elif selected_tab == "Transaktionen":
+            show_transactions(role, current_user)
+        else:
+            show_dashboard()
+
+    if role == "admin" and st.sidebar.toggle("Debug-Informationen", key="debug_panel"):
+        show_debug_panel(tab_profile)
 else:
     if authentication_status == False:
         st.error("Benutzername/Passwort ist falsch")
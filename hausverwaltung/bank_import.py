@@ -0,0 +1,301 @@
+"""Import of bank statements into the Einzahlungsfonds.
+
+Statements are read line by line, a CSV export in chunks with pandas and a
+CAMT.053 XML file entry by entry, so the memory needed does not grow with
+the length of the statement. Incoming payments are matched to a group by
+the group name in the reference or in the payer's name, and added as
+pending deposits that are confirmed like the ones entered by hand. Every
+line is stored with a hash; lines imported before are skipped, so the same
+statement can be imported again.
+"""
+
+import hashlib
+import re
+import xml.etree.ElementTree as ElementTree
+from datetime import date
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from sqlalchemy import select
+
+import queries
+from functions import add_transactions_bulk
+from models import Group, Session, Transaction
+
+CHUNK_SIZE = 1000
+# Only the first unmatched lines are kept for the report.
+UNMATCHED_SAMPLE = 100
+
+# Raised for files that are not a readable statement.
+STATEMENT_ERRORS = (ValueError, KeyError, ElementTree.ParseError)
+
+CSV_COLUMNS = {
+    "date": "Buchungstag",
+    "amount": "Betrag",
+    "name": "Name",
+    "reference": "Verwendungszweck",
+}
+
+
+class StatementLine:
+    """One booking of a bank statement; credits have a positive amount."""
+
+    def __init__(
+        self,
+        booking_date: date,
+        amount: float,
+        name: str = "",
+        reference: str = "",
+    ):
+        self.booking_date = booking_date
+        self.amount = amount
+        self.name = name
+        self.reference = reference
+
+    def key(self) -> str:
+        """Identifies the line in both the CSV and the CAMT.053 export."""
+        return "|".join(
+            (
+                self.booking_date.isoformat(),
+                f"{self.amount:.2f}",
+                self.name,
+                self.reference,
+            )
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "date": self.booking_date,
+            "amount": self.amount,
+            "name": self.name,
+            "reference": self.reference,
+        }
+
+
+def read_csv(
+    file: IO,
+    columns: Dict[str, str] = CSV_COLUMNS,
+    sep: str = ";",
+    decimal: str = ",",
+    date_format: str = "%d.%m.%Y",
+    encoding: str = "utf-8",
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[StatementLine]:
+    """Reads a CSV export; ``columns`` maps the fields to the column headers."""
+    chunks = pd.read_csv(
+        file,
+        sep=sep,
+        dtype=str,
+        keep_default_na=False,
+        encoding=encoding,
+        usecols=list(columns.values()),
+        chunksize=chunk_size,
+    )
+    for chunk in chunks:
+        amounts = chunk[columns["amount"]].str.replace(" ", "", regex=False)
+        if decimal == ",":
+            amounts = amounts.str.replace(".", "", regex=False).str.replace(
+                ",", ".", regex=False
+            )
+        amounts = pd.to_numeric(amounts)
+        dates = pd.to_datetime(chunk[columns["date"]], format=date_format).dt.date
+        for booking_date, amount, name, reference in zip(
+            dates, amounts, chunk[columns["name"]], chunk[columns["reference"]]
+        ):
+            yield StatementLine(
+                booking_date, float(amount), name.strip(), reference.strip()
+            )
+
+
+def _local_name(tag: str) -> str:
+    return tag.rpartition("}")[2]
+
+
+def _first(element, name: str):
+    for child in element.iter():
+        if _local_name(child.tag) == name:
+            return child
+    return None
+
+
+def _text(element, name: str) -> str:
+    found = _first(element, name) if element is not None else None
+    return (found.text or "").strip() if found is not None else ""
+
+
+def _camt_entry(entry) -> StatementLine:
+    # Amount, indicator and booking date are direct children of the entry,
+    # the transaction details below repeat some of them.
+    children = {_local_name(child.tag): child for child in entry}
+    amount = float(children["Amt"].text)
+    if children["CdtDbtInd"].text == "DBIT":
+        amount = -amount
+    booked = children["BookgDt"]
+    booked_on = _text(booked, "Dt") or _text(booked, "DtTm")
+    reference = " ".join(
+        (element.text or "").strip()
+        for element in entry.iter()
+        if _local_name(element.tag) == "Ustrd"
+    )
+    return StatementLine(
+        date.fromisoformat(booked_on[:10]),
+        amount,
+        _text(_first(entry, "Dbtr"), "Nm"),
+        reference,
+    )
+
+
+def _is(element, name: str) -> bool:
+    return element.tag == name or element.tag.endswith("}" + name)
+
+
+def read_camt053(file: IO) -> Iterator[StatementLine]:
+    """Reads the entries of a CAMT.053 statement, whatever its version.
+
+    Entries are removed from their statement once read, so only the entry
+    being parsed is held in memory.
+    """
+    statement = None
+    for event, element in ElementTree.iterparse(file, events=("start", "end")):
+        if event == "start":
+            if _is(element, "Stmt"):
+                statement = element
+        elif _is(element, "Ntry"):
+            line = _camt_entry(element)
+            if statement is not None:
+                statement.remove(element)
+            yield line
+
+
+def read_statement(file: IO, filename: str) -> Iterator[StatementLine]:
+    """Reads a CAMT.053 file if the name ends in ``.xml``, else a CSV export."""
+    if filename.lower().endswith(".xml"):
+        return read_camt053(file)
+    return read_csv(file)
+
+
+def _hashed(lines: Iterable[StatementLine]) -> Iterator[Tuple[StatementLine, str]]:
+    """Pairs every line with its hash.
+
+    Identical lines on the same day, e.g. two equal payments, are told apart
+    by their position among each other. Statements are in booking order, so
+    only the lines of the current day are counted.
+    """
+    day = None
+    seen: Dict[str, int] = {}
+    for line in lines:
+        if line.booking_date != day:
+            day = line.booking_date
+            seen.clear()
+        key = line.key()
+        occurrence = seen.get(key, 0)
+        seen[key] = occurrence + 1
+        yield line, hashlib.sha256(f"{key}|{occurrence}".encode()).hexdigest()
+
+
+class GroupMatcher:
+    """Finds the group named in a statement line."""
+
+    def __init__(self, group_ids: Dict[str, int]):
+        self._ids = {name.casefold(): group_id for name, group_id in group_ids.items()}
+        # Longer names first, "Gruppe 10" must not match as "Gruppe 1".
+        names = sorted(group_ids, key=len, reverse=True)
+        self._pattern = (
+            re.compile(
+                r"(?<!\w)(" + "|".join(map(re.escape, names)) + r")(?!\w)",
+                re.IGNORECASE,
+            )
+            if names
+            else None
+        )
+
+    def match(self, line: StatementLine) -> Optional[int]:
+        """Returns the group named in the reference, else in the payer's name.
+
+        Lines naming more than one group are left for manual entry.
+        """
+        if self._pattern is None:
+            return None
+        for text in (line.reference, line.name):
+            found = {self._ids[name.casefold()] for name in self._pattern.findall(text)}
+            if found:
+                return found.pop() if len(found) == 1 else None
+        return None
+
+
+class ImportResult:
+    """Counts of an import and a sample of the lines that need manual entry."""
+
+    def __init__(self):
+        self.imported = 0
+        self.duplicates = 0
+        self.debits = 0
+        self.unmatched = 0
+        self.unmatched_lines: List[StatementLine] = []
+
+    def add_unmatched(self, line: StatementLine) -> None:
+        self.unmatched += 1
+        if len(self.unmatched_lines) < UNMATCHED_SAMPLE:
+            self.unmatched_lines.append(line)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "debits": self.debits,
+            "unmatched": self.unmatched,
+            "unmatched_lines": [line.to_dict() for line in self.unmatched_lines],
+        }
+
+
+def import_statement(
+    lines: Iterable[StatementLine], chunk_size: int = CHUNK_SIZE
+) -> ImportResult:
+    """Adds the matched credits as pending deposits into the Einzahlungsfonds.
+
+    Every chunk is checked against the stored hashes with one query,
+    inserted with one executemany and committed, so an interrupted import
+    continues where it stopped when it is run again.
+    """
+    result = ImportResult()
+    with Session() as session:
+        deposit_fund = queries.fund_by_name(session, "Einzahlungsfonds")
+        if deposit_fund is None:
+            raise ValueError("Kein Einzahlungsfonds vorhanden.")
+        matcher = GroupMatcher(dict(session.query(Group.name, Group.id)))
+
+        hashed = _hashed(lines)
+        while chunk := list(islice(hashed, chunk_size)):
+            known = set(
+                session.scalars(
+                    select(Transaction.statement_line_hash).where(
+                        Transaction.statement_line_hash.in_(
+                            [line_hash for _, line_hash in chunk]
+                        )
+                    )
+                )
+            )
+            specs = []
+            for line, line_hash in chunk:
+                if line.amount <= 0:
+                    result.debits += 1
+                elif line_hash in known:
+                    result.duplicates += 1
+                elif (group_id := matcher.match(line)) is None:
+                    result.add_unmatched(line)
+                else:
+                    specs.append(
+                        {
+                            "fund_id": deposit_fund.id,
+                            "amount": line.amount,
+                            "date": line.booking_date,
+                            "group_id": group_id,
+                            "comment": line.reference or line.name,
+                            "statement_line_hash": line_hash,
+                        }
+                    )
+            add_transactions_bulk(session, specs)
+            session.commit()
+            result.imported += len(specs)
+    return result
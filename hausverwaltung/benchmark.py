@@ -0,0 +1,986 @@
+"""Benchmarks and stress checks against a throwaway database.
+
+Run from the repository root, e.g.
+``python hausverwaltung/benchmark.py concurrency --threads 8``.
+
+The database is created in a temporary directory. The path has to be
+configured before the models are imported, so the scenarios import the
+application modules lazily.
+
+``suite`` measures the main functions on synthetic data of several scales,
+each in its own process, and writes the results to a JSON file;
+``compare`` reports the differences between two such files.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import re
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, datetime
+from typing import Dict, Optional
+
+
+def use_temporary_database() -> str:
+    directory = tempfile.mkdtemp(prefix="hausverwaltung-benchmark-")
+    path = os.path.join(directory, "benchmark.db")
+    os.environ["HAUSVERWALTUNG_DB_PATH"] = path
+    return path
+
+
+def seed_minimal(groups: int = 10, funds: int = 5) -> None:
+    """Creates a few groups with a member, a room and a payment schedule,
+    some funds and the house's expenses."""
+    from bootstrap import init_db
+    from models import (
+        Expense,
+        Fund,
+        Group,
+        MonthlyCash,
+        PeopleCategory,
+        Person,
+        Room,
+        Session,
+    )
+
+    init_db()
+    with Session() as session:
+        session.add(Fund(name="Einzahlungsfonds", current_balance=0, yearly_target=0))
+        for index in range(funds):
+            session.add(
+                Fund(name=f"Fonds {index}", current_balance=0, yearly_target=1200)
+            )
+        session.add(Expense(name="Miete", yearly_amount=60000, type="rent"))
+        session.add(Expense(name="Nebenkosten", yearly_amount=12000, type="ancillary"))
+        adult = PeopleCategory(name="Erwachsen", monthly_base_need=1000, head_count=1)
+        session.add(adult)
+        for index in range(groups):
+            group = Group(
+                name=f"Gruppe {index}",
+                password="-",
+                role="user",
+                active=True,
+                income=2000,
+            )
+            group.members.append(Person(category=adult))
+            group.rooms.append(Room(name=f"Zimmer {index}", area=15))
+            session.add(group)
+            session.flush()
+            session.add(
+                MonthlyCash(
+                    group_id=group.id,
+                    amount=100,
+                    start_date=date(2022, 1, 1),
+                    end_date=date(2030, 12, 31),
+                )
+            )
+        session.commit()
+
+
+def concurrency(args) -> int:
+    """Runs deposit writers and dashboard readers in parallel threads.
+
+    The arrears ledger starts out empty, so the readers race to materialize
+    it as on the first render of a month. Fails if any thread runs into an
+    error such as "database is locked", or if the ledger ends up differing
+    from one recomputed from the deposits.
+    """
+    seed_minimal(groups=args.threads)
+    import functions
+    from models import Fund, Session, Transaction
+
+    with Session() as session:
+        deposit_fund_id = (
+            session.query(Fund.id).filter(Fund.name == "Einzahlungsfonds").scalar()
+        )
+
+    errors = []
+    counts = {"writes": 0, "reads": 0}
+    lock = threading.Lock()
+    start = threading.Barrier(2 * args.threads)
+
+    def writer(group_id: int) -> None:
+        start.wait()
+        for index in range(args.operations):
+            try:
+                functions.add_transaction(
+                    deposit_fund_id,
+                    100,
+                    date(2022 + index % 4, index % 12 + 1, 1),
+                    group_id,
+                    comment="benchmark",
+                )
+                with Session() as session:
+                    transaction_id = (
+                        session.query(Transaction.id)
+                        .filter(Transaction.group_id == group_id)
+                        .order_by(Transaction.id.desc())
+                        .limit(1)
+                        .scalar()
+                    )
+                functions.confirm_transaction(transaction_id)
+                with lock:
+                    counts["writes"] += 1
+            except Exception as error:
+                with lock:
+                    errors.append(repr(error))
+
+    def reader() -> None:
+        start.wait()
+        for _ in range(args.operations):
+            try:
+                functions.check_missing_payments()
+                with lock:
+                    counts["reads"] += 1
+            except Exception as error:
+                with lock:
+                    errors.append(repr(error))
+
+    threads = [
+        threading.Thread(target=writer, args=(group_id,))
+        for group_id in range(1, args.threads + 1)
+    ] + [threading.Thread(target=reader) for _ in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    mismatches = functions.rebuild_arrears_ledger(check_only=True)
+
+    print(
+        f"{args.threads} writers and {args.threads} readers: "
+        f"{counts['writes']} writes, {counts['reads']} reads, "
+        f"{len(errors)} errors in {elapsed:.2f}s, "
+        f"{len(mismatches)} arrears mismatches"
+    )
+    for error in sorted(set(errors)):
+        print(f"  {error}")
+    return 1 if errors or mismatches else 0
+
+
+def transfers(args) -> int:
+    """Runs transfers between funds from parallel threads.
+
+    Fails if a transfer id is shared by more than one transfer or a
+    transfer does not consist of exactly two legs that cancel out.
+    """
+    seed_minimal(groups=args.threads, funds=2)
+    import functions
+    from sqlalchemy import func
+
+    from models import Fund, Session, Transaction, Transfer
+
+    with Session() as session:
+        from_fund_id, to_fund_id = (
+            fund_id
+            for fund_id, in session.query(Fund.id)
+            .filter(Fund.name != "Einzahlungsfonds")
+            .order_by(Fund.id)
+        )
+
+    errors = []
+    transfer_ids = []
+    lock = threading.Lock()
+
+    def worker(group_id: int) -> None:
+        for _ in range(args.operations):
+            try:
+                transfer_id = functions.transfer_funds(
+                    from_fund_id, to_fund_id, 10, group_id
+                )
+                with lock:
+                    transfer_ids.append(transfer_id)
+            except Exception as error:
+                with lock:
+                    errors.append(repr(error))
+
+    threads = [
+        threading.Thread(target=worker, args=(group_id,))
+        for group_id in range(1, args.threads + 1)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with Session() as session:
+        transfer_count = session.query(func.count(Transfer.id)).scalar()
+        broken = (
+            session.query(Transaction.transfer_id)
+            .group_by(Transaction.transfer_id)
+            .having(
+                (func.count(Transaction.id) != 2) | (func.sum(Transaction.amount) != 0)
+            )
+            .filter(Transaction.transfer_id != None)
+            .all()
+        )
+    if len(set(transfer_ids)) != len(transfer_ids):
+        errors.append("transfer id returned twice")
+    if transfer_count != len(transfer_ids):
+        errors.append(f"{transfer_count} transfers stored, {len(transfer_ids)} made")
+    errors.extend(f"transfer {transfer_id} is unbalanced" for transfer_id, in broken)
+
+    print(
+        f"{args.threads} threads: {len(transfer_ids)} transfers, "
+        f"{len(errors)} errors in {elapsed:.2f}s"
+    )
+    for error in sorted(set(errors)):
+        print(f"  {error}")
+    return 1 if errors else 0
+
+
+def distribution(args) -> int:
+    """Distributes the Einzahlungsfonds over many funds and counts the commits.
+
+    Compares one add_transaction call per leg, as distribute_funds used to
+    do, with distribute_funds on top of add_transactions_bulk.
+    """
+    seed_minimal(groups=1, funds=args.funds)
+    import functions
+    from sqlalchemy import event
+
+    from models import Fund, Session, engine
+
+    commits = []
+    event.listen(engine, "commit", lambda connection: commits.append(1))
+
+    def fill_deposit_fund() -> None:
+        with Session() as session:
+            session.query(Fund).filter(Fund.name == "Einzahlungsfonds").update(
+                {Fund.current_balance: 10000}
+            )
+            session.commit()
+
+    def per_row() -> None:
+        with Session() as session:
+            deposit_fund = (
+                session.query(Fund).filter(Fund.name == "Einzahlungsfonds").one()
+            )
+            funds = session.query(Fund).all()
+            total_target = sum(fund.yearly_target for fund in funds)
+            for fund in funds:
+                amount = round(
+                    fund.yearly_target / total_target * deposit_fund.current_balance
+                )
+                functions.add_transaction(fund.id, amount, date.today(), 1)
+                functions.add_transaction(deposit_fund.id, -amount, date.today(), 1)
+            deposit_fund.current_balance = 0
+            session.commit()
+
+    def bulk() -> None:
+        functions.distribute_funds(1)
+
+    for name, run in (("add_transaction per leg", per_row), ("distribute_funds", bulk)):
+        fill_deposit_fund()
+        commits.clear()
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+        print(
+            f"{name}: {args.funds} funds, {len(commits)} commits "
+            f"in {elapsed * 1000:.1f} ms"
+        )
+    return 0
+
+
+def rollover(args) -> int:
+    """Accepts a bidding round of many groups and counts queries and commits.
+
+    Compares cutting off and adding the schedules per bid with the ORM, as
+    bids_to_rent used to do, with the set-based bids_to_rent.
+    """
+    seed_minimal(groups=args.groups, funds=1)
+    import functions
+    from sqlalchemy import event
+
+    from models import (
+        Bid,
+        BiddingStatus,
+        Group,
+        MonthlyCash,
+        MonthlyGiro,
+        Session,
+        engine,
+    )
+
+    # Materialize the arrears ledger, so the rollover has months to refresh.
+    functions.check_missing_payments()
+    commits = []
+    queries = []
+    event.listen(engine, "commit", lambda connection: commits.append(1))
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(1))
+    period_start = date.today().replace(month=1, day=1)
+
+    def open_bidding_round() -> int:
+        with Session() as session:
+            bidding_status = BiddingStatus(
+                status="accepted",
+                total_giro_needed=400.0 * args.groups,
+                total_cash_needed=200.0 * args.groups,
+                total_amount_pledged=600.0 * args.groups,
+                period_start=period_start,
+                period_end=period_start.replace(month=12, day=31),
+            )
+            session.add(bidding_status)
+            session.flush()
+            session.add_all(
+                Bid(
+                    group_id=group_id,
+                    bidding_status_id=bidding_status.id,
+                    amount=500 + group_id % 200,
+                )
+                for group_id, in session.query(Group.id)
+            )
+            session.commit()
+            return bidding_status.id
+
+    def per_bid(bidding_status, session) -> None:
+        total_needed = bidding_status.total_amount_needed
+        total_pledged = bidding_status.total_amount_pledged
+        cash_needed = bidding_status.total_cash_needed - max(
+            total_needed - total_pledged, 0
+        )
+        for bid in bidding_status.bids:
+            group = session.query(Group).filter(Group.id == bid.group_id).first()
+            proportion = bid.amount / total_pledged
+            cash_part = math.ceil(cash_needed * proportion / 5) * 5
+            giro_part = bidding_status.total_giro_needed * proportion - cash_part
+            for model, amount in ((MonthlyCash, cash_part), (MonthlyGiro, giro_part)):
+                for record in (
+                    session.query(model)
+                    .filter(
+                        model.group_id == group.id,
+                        model.end_date >= bidding_status.period_start,
+                    )
+                    .all()
+                ):
+                    record.end_date = bidding_status.period_start
+                session.add(
+                    model(
+                        group_id=group.id,
+                        amount=amount,
+                        start_date=bidding_status.period_start,
+                        end_date=bidding_status.period_end,
+                    )
+                )
+            session.flush()
+            functions.refresh_arrears(session, group.id, bidding_status.period_start)
+        session.commit()
+
+    for name, run in (("per bid", per_bid), ("bids_to_rent", functions.bids_to_rent)):
+        bidding_status_id = open_bidding_round()
+        with Session() as session:
+            bidding_status = session.get(BiddingStatus, bidding_status_id)
+            commits.clear()
+            queries.clear()
+            started = time.perf_counter()
+            run(bidding_status, session)
+            elapsed = time.perf_counter() - started
+        print(
+            f"{name}: {args.groups} groups, {len(queries)} queries, "
+            f"{len(commits)} commits in {elapsed * 1000:.1f} ms"
+        )
+    return 0
+
+
+def deleted_fund(args) -> int:
+    """Rebuilds the fund balance snapshots after a fund has been deleted.
+
+    The confirmed transactions of a deleted fund are kept without a fund
+    and must not end up in the snapshots.
+    """
+    seed_minimal(groups=1, funds=3)
+    import functions
+    from sqlalchemy import func
+
+    from models import Fund, FundBalanceSnapshot, Session, Transaction
+
+    with Session() as session:
+        fund_ids = [fund_id for fund_id, in session.query(Fund.id).order_by(Fund.id)]
+    for fund_id in fund_ids:
+        functions.add_transaction(fund_id, 100, date(2022, 1, 5), 1, confirmed=True)
+    functions.delete_fund(fund_ids[-1], fund_ids[0], 1)
+    functions.rebuild_fund_snapshots()
+
+    with Session() as session:
+        expected = dict(
+            session.query(Transaction.fund_id, func.sum(Transaction.amount))
+            .filter(Transaction.confirmed == True, Transaction.fund_id.isnot(None))
+            .group_by(Transaction.fund_id)
+        )
+    with Session() as session:
+        balances = functions.fund_balances_at(session)
+        orphans = session.query(FundBalanceSnapshot).filter(
+            FundBalanceSnapshot.fund_id.notin_(fund_ids[:-1])
+        )
+        errors = [f"snapshot of fund {row.fund_id}" for row in orphans]
+    errors.extend(
+        f"fund {fund_id}: snapshot {balances.get(fund_id)}, transactions {total}"
+        for fund_id, total in expected.items()
+        if balances.get(fund_id) != total
+    )
+    print(f"{len(expected)} funds after deleting one, {len(errors)} errors")
+    for error in errors:
+        print(f"  {error}")
+    return 1 if errors else 0
+
+
+def reconcile(args) -> int:
+    """Times the fund balance reconciliation over many confirmed transactions."""
+    seed_minimal(groups=10, funds=args.funds)
+    import functions
+    from sqlalchemy import func, insert
+
+    from models import Fund, Session, Transaction
+
+    with Session() as session:
+        fund_ids = [fund_id for fund_id, in session.query(Fund.id).order_by(Fund.id)]
+        session.execute(
+            insert(Transaction),
+            [
+                {
+                    "fund_id": fund_ids[index % len(fund_ids)],
+                    "amount": index % 100 + 0.25,
+                    "date": date(2022 + index % 4, index % 12 + 1, 1),
+                    "group_id": index % 10 + 1,
+                    "confirmed": index % 10 != 0,
+                }
+                for index in range(args.transactions)
+            ],
+        )
+        session.query(Fund).update(
+            {
+                Fund.current_balance: session.query(func.sum(Transaction.amount))
+                .filter(Transaction.fund_id == Fund.id, Transaction.confirmed == True)
+                .scalar_subquery()
+            },
+            synchronize_session=False,
+        )
+        # Let a few funds drift.
+        session.query(Fund).filter(Fund.id.in_(fund_ids[:3])).update(
+            {Fund.current_balance: Fund.current_balance + 1},
+            synchronize_session=False,
+        )
+        session.commit()
+
+    for repair in (False, True, False):
+        started = time.perf_counter()
+        drift = functions.reconcile_fund_balances(repair=repair)
+        elapsed = time.perf_counter() - started
+        print(
+            f"{'repair' if repair else 'check'}: {args.transactions} transactions, "
+            f"{len(drift)} drifted funds in {elapsed * 1000:.1f} ms"
+        )
+    return 0
+
+
+def startup(args) -> int:
+    """Compares the per-rerun cost of schema setup before and after bootstrapping.
+
+    Before, every Streamlit rerun ran ``create_all`` and built a new session
+    factory; now a rerun only calls the already initialized ``init_db``.
+    """
+    from sqlalchemy.orm import sessionmaker
+
+    from bootstrap import init_db
+    from models import Base, engine
+
+    started = time.perf_counter()
+    init_db()
+    print(f"first init_db: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+    def per_rerun(step) -> float:
+        started = time.perf_counter()
+        for _ in range(args.reruns):
+            step()
+        return (time.perf_counter() - started) / args.reruns * 1000
+
+    def create_all_every_rerun() -> None:
+        Base.metadata.create_all(bind=engine)
+        sessionmaker(bind=engine)
+
+    before = per_rerun(create_all_every_rerun)
+    after = per_rerun(init_db)
+    print(f"per rerun with create_all: {before:.3f} ms")
+    print(f"per rerun with init_db:    {after:.3f} ms")
+    return 0
+
+
+# Lookup tables with one row per fund, group, room and so on. They are read
+# as a whole on purpose, e.g. to build the rent calculation for all groups.
+LOOKUP_TABLES = {
+    "app_state",
+    "expenses",
+    "funds",
+    "groups",
+    "people_categories",
+    "persons",
+    "room_tenants",
+    "rooms",
+}
+
+
+def plan_workload() -> None:
+    """Calls the public functions of functions.py once each.
+
+    The bank statement import, the transaction browser queries and the fund
+    forecast run too.
+    """
+    import functions
+    import queries
+    from bank_import import StatementLine, import_statement
+    from forecast import forecast_funds
+    from models import BiddingStatus, Bid, Fund, Group, Session
+
+    with Session() as session:
+        group_name = session.get(Group, 1).name
+        deposit_fund_id = functions._deposit_fund_id(session)
+        fund_ids = [
+            fund_id
+            for fund_id, in session.query(Fund.id).filter(Fund.id != deposit_fund_id)
+        ]
+    functions.check_missing_payments()
+    functions.add_transaction(deposit_fund_id, 100, date(2022, 1, 5), 1, "plans")
+    functions.confirm_transaction(1)
+    functions.add_transaction(deposit_fund_id, 50, date(2022, 2, 5), 1, "plans")
+    functions.delete_transaction(2)
+    functions.transfer_funds(fund_ids[0], fund_ids[1], 10, 1)
+    functions.distribute_funds(1)
+    functions.calculate_rent_for_group(1)
+    functions.calculate_rent_for_all_groups()
+    functions.reconcile_fund_balances(repair=True)
+    functions.schedule_issues()
+    import_statement([StatementLine(date(2022, 3, 2), 100, "", group_name)])
+    with Session() as session:
+        for filters in (
+            {},
+            {"fund_id": deposit_fund_id},
+            {"group_id": 1, "start": date(2022, 1, 1), "end": date(2022, 12, 31)},
+            {"confirmed": False},
+        ):
+            queries.transactions_page(
+                session, 51, before=(date(2022, 6, 1), 10**9), **filters
+            )
+        functions.fund_balances_at(session, date(2022, 6, 1))
+        functions.current_payments(session.get(Group, 1), session)
+        forecast_funds(session)
+        bidding_status = BiddingStatus(
+            status="evaluated",
+            total_giro_needed=1000,
+            total_cash_needed=500,
+            total_amount_pledged=1500,
+            period_start=date(2023, 1, 1),
+            period_end=date(2023, 12, 31),
+        )
+        session.add(bidding_status)
+        session.flush()
+        session.add(Bid(group_id=1, bidding_status_id=bidding_status.id, amount=1500))
+        session.flush()
+        functions.bids_to_rent(bidding_status, session)
+    functions.delete_fund(fund_ids[-1], fund_ids[0], 1)
+
+
+def _scanned_table(name: str, statement: str) -> Optional[str]:
+    """Resolves the name in a plan row to a table.
+
+    Aliases are mapped to their table, subqueries return None.
+    """
+    from models import Base
+
+    if name in Base.metadata.tables:
+        return name
+    match = re.search(rf"\b(\w+) AS {re.escape(name)}\b", statement)
+    if match and match.group(1) in Base.metadata.tables:
+        return match.group(1)
+    return None
+
+
+def check_plans(args) -> int:
+    """Records the query plan of every statement the workload runs.
+
+    Fails if a statement scans a table other than the small lookup tables
+    without using an index.
+    """
+    from sqlalchemy import event
+
+    from models import engine
+
+    seed_minimal(groups=20)
+    statements = {}
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().split(None, 1)[0].upper() in (
+            "SELECT",
+            "UPDATE",
+            "DELETE",
+        ):
+            statements.setdefault(
+                statement, parameters[0] if executemany else parameters
+            )
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        plan_workload()
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    report = []
+    full_scans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements.items():
+            plan = connection.exec_driver_sql(
+                f"EXPLAIN QUERY PLAN {statement}", parameters
+            ).all()
+            report.append(statement.strip())
+            for row in plan:
+                detail = row[-1]
+                report.append(f"  {detail}")
+                words = detail.split()
+                if words[0] != "SCAN" or "USING" in words:
+                    continue
+                table = _scanned_table(words[1], statement)
+                if table and table not in LOOKUP_TABLES:
+                    full_scans.append((detail, statement.strip()))
+            report.append("")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write("\n".join(report))
+        print(f"plans of {len(statements)} statements written to {args.output}")
+    print(f"{len(statements)} statements, {len(full_scans)} full table scans")
+    for detail, statement in full_scans:
+        print(f"  {detail}: {' '.join(statement.split())}")
+    return 1 if full_scans else 0
+
+
+def _measure(call, setup=None, repeat: int = 5) -> Dict[str, float]:
+    """Runs ``call(setup())`` repeatedly and reports time, queries and memory.
+
+    The first run is reported separately because it fills caches and
+    ledgers. Setup is neither timed nor counted. Peak memory is traced in an
+    extra run, since tracemalloc slows the code down.
+    """
+    from sqlalchemy import event
+
+    from models import engine
+
+    query_count = [0]
+
+    def count(*args) -> None:
+        query_count[0] += 1
+
+    times = []
+    queries = []
+    event.listen(engine, "before_cursor_execute", count)
+    try:
+        for _ in range(repeat):
+            argument = setup() if setup else None
+            query_count[0] = 0
+            started = time.perf_counter()
+            call(argument)
+            times.append((time.perf_counter() - started) * 1000)
+            queries.append(query_count[0])
+        argument = setup() if setup else None
+        tracemalloc.start()
+        call(argument)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    return {
+        "first_ms": round(times[0], 3),
+        "median_ms": round(statistics.median(times[1:] or times), 3),
+        "first_queries": queries[0],
+        "queries": queries[-1],
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def measure(args) -> int:
+    """Generates one scale of synthetic data and measures the functions on it."""
+    from bootstrap import init_db
+    from synthetic import FIRST_YEAR, SCALES, generate
+
+    init_db()
+    scale = SCALES[args.scale]
+    started = time.perf_counter()
+    rows = generate(scale, seed=args.seed)
+    generate_s = time.perf_counter() - started
+
+    import functions
+    from sqlalchemy import func
+
+    from models import Bid, BiddingStatus, Fund, Session, Transaction
+
+    groups = scale["groups"]
+    next_period = [FIRST_YEAR + scale["years"]]
+
+    def fill_deposit_fund():
+        with Session() as session:
+            session.query(Fund).filter(Fund.id == 1).update(
+                {Fund.current_balance: 10000}
+            )
+            session.commit()
+
+    def open_bidding_round() -> int:
+        year = next_period[0]
+        next_period[0] += 1
+        with Session() as session:
+            bidding_status = BiddingStatus(
+                status="evaluated",
+                total_giro_needed=400.0 * groups,
+                total_cash_needed=200.0 * groups,
+                total_amount_pledged=600.0 * groups,
+                period_start=date(year, 1, 1),
+                period_end=date(year, 12, 31),
+            )
+            session.add(bidding_status)
+            session.flush()
+            session.add_all(
+                Bid(group_id=group_id, bidding_status_id=bidding_status.id, amount=600)
+                for group_id in range(1, groups + 1)
+            )
+            session.commit()
+            return bidding_status.id
+
+    def run_bids_to_rent(bidding_status_id: int) -> None:
+        with Session() as session:
+            functions.bids_to_rent(
+                session.get(BiddingStatus, bidding_status_id), session
+            )
+
+    def pending_deposit() -> int:
+        functions.add_transaction(1, 150, date(FIRST_YEAR, 6, 15), groups // 2 + 1)
+        with Session() as session:
+            return session.query(func.max(Transaction.id)).scalar()
+
+    cases = {
+        "check_missing_payments": (
+            lambda _: functions.check_missing_payments(),
+            None,
+        ),
+        "calculate_rent_for_group": (
+            lambda _: functions.calculate_rent_for_group(groups // 2 + 1),
+            None,
+        ),
+        "calculate_rent_for_all_groups": (
+            lambda _: functions.calculate_rent_for_all_groups(),
+            None,
+        ),
+        "distribute_funds": (
+            lambda _: functions.distribute_funds(1),
+            fill_deposit_fund,
+        ),
+        "bids_to_rent": (run_bids_to_rent, open_bidding_round),
+        "confirm_transaction": (functions.confirm_transaction, pending_deposit),
+    }
+    results = {}
+    for name, (call, setup) in cases.items():
+        results[name] = _measure(call, setup, repeat=args.repeat)
+        print(f"{args.scale} {name}: {results[name]}")
+
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "scale": args.scale,
+                "params": scale,
+                "seed": args.seed,
+                "rows": rows,
+                "generate_s": round(generate_s, 3),
+                "results": results,
+            },
+            file,
+        )
+    return 0
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def suite(args) -> int:
+    """Measures every scale in its own process and writes one JSON file."""
+    runs = []
+    for scale in args.scales.split(","):
+        with tempfile.NamedTemporaryFile(suffix=".json") as output:
+            completed = subprocess.run(
+                [
+                    sys.executable,
+                    os.path.abspath(__file__),
+                    "measure",
+                    "--scale",
+                    scale,
+                    "--seed",
+                    str(args.seed),
+                    "--repeat",
+                    str(args.repeat),
+                    "--output",
+                    output.name,
+                ]
+            )
+            if completed.returncode:
+                return completed.returncode
+            with open(output.name) as file:
+                runs.append(json.load(file))
+
+    with open(args.output, "w") as file:
+        json.dump(
+            {
+                "commit": _commit(),
+                "created": datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "runs": runs,
+            },
+            file,
+            indent=2,
+        )
+    print(f"results written to {args.output}")
+    return 0
+
+
+def compare(args) -> int:
+    """Compares two suite results; fails on slower functions or more queries."""
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    before = {
+        (run["scale"], name): result
+        for run in baseline["runs"]
+        for name, result in run["results"].items()
+    }
+    print(f"{baseline['commit']} -> {current['commit']}")
+    regressions = 0
+    for run in current["runs"]:
+        for name, result in run["results"].items():
+            old = before.get((run["scale"], name))
+            if old is None:
+                continue
+            ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else 1
+            regressed = ratio > args.threshold or result["queries"] > old["queries"]
+            regressions += regressed
+            print(
+                f"{'!' if regressed else ' '} {run['scale']:<7} {name:<30} "
+                f"{old['median_ms']:>9.1f} -> {result['median_ms']:>9.1f} ms "
+                f"({ratio:.2f}x), queries {old['queries']} -> {result['queries']}, "
+                f"peak {old['peak_kib']:.0f} -> {result['peak_kib']:.0f} KiB"
+            )
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="benchmark")
+    subparsers = parser.add_subparsers(dest="scenario", required=True)
+
+    stress = subparsers.add_parser(
+        "concurrency", help="parallel deposit writers and readers"
+    )
+    stress.add_argument("--threads", type=int, default=8)
+    stress.add_argument("--operations", type=int, default=25)
+    stress.set_defaults(handler=concurrency)
+
+    transfer = subparsers.add_parser(
+        "transfers", help="parallel transfers between two funds"
+    )
+    transfer.add_argument("--threads", type=int, default=8)
+    transfer.add_argument("--operations", type=int, default=25)
+    transfer.set_defaults(handler=transfers)
+
+    distribute = subparsers.add_parser(
+        "distribution", help="commits and latency of distributing deposits"
+    )
+    distribute.add_argument("--funds", type=int, default=20)
+    distribute.set_defaults(handler=distribution)
+
+    accept = subparsers.add_parser(
+        "rollover", help="queries and latency of accepting a bidding round"
+    )
+    accept.add_argument("--groups", type=int, default=150)
+    accept.set_defaults(handler=rollover)
+
+    deleted = subparsers.add_parser(
+        "deleted-fund", help="rebuild the fund snapshots after deleting a fund"
+    )
+    deleted.set_defaults(handler=deleted_fund)
+
+    balances = subparsers.add_parser(
+        "reconcile", help="fund balance reconciliation over many transactions"
+    )
+    balances.add_argument("--transactions", type=int, default=100000)
+    balances.add_argument("--funds", type=int, default=20)
+    balances.set_defaults(handler=reconcile)
+
+    start = subparsers.add_parser(
+        "startup", help="schema setup overhead per Streamlit rerun"
+    )
+    start.add_argument("--reruns", type=int, default=200)
+    start.set_defaults(handler=startup)
+
+    plans = subparsers.add_parser(
+        "check-plans",
+        help="fail if a query of functions.py scans a table without an index",
+    )
+    plans.add_argument("--output", help="file to write all query plans to")
+    plans.set_defaults(handler=check_plans)
+
+    single = subparsers.add_parser(
+        "measure", help="measure the functions on one scale of synthetic data"
+    )
+    single.add_argument("--scale", default="small")
+    single.add_argument("--seed", type=int, default=0)
+    single.add_argument("--repeat", type=int, default=5)
+    single.add_argument("--output", required=True)
+    single.set_defaults(handler=measure)
+
+    scales = subparsers.add_parser(
+        "suite", help="measure all scales and write the results as JSON"
+    )
+    scales.add_argument("--scales", default="small,medium,large")
+    scales.add_argument("--seed", type=int, default=0)
+    scales.add_argument("--repeat", type=int, default=5)
+    scales.add_argument("--output", default="benchmark.json")
+    scales.set_defaults(handler=suite, database=False)
+
+    regressions = subparsers.add_parser(
+        "compare", help="compare two suite results, fail on regressions"
+    )
+    regressions.add_argument("baseline")
+    regressions.add_argument("current")
+    regressions.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="slowdown of the median time that counts as a regression",
+    )
+    regressions.set_defaults(handler=compare, database=False)
+
+    args = parser.parse_args(argv)
+    if getattr(args, "database", True):
+        print(f"database: {use_temporary_database()}")
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
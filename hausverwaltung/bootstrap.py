@@ -0,0 +1,38 @@
+"""One-time database setup per process.
+
+Importing the models only builds the engine and the session factory. The
+schema is brought up to date by ``init_db``, which every entry point calls
+once at startup. Later calls, e.g. on every Streamlit rerun, return
+immediately without touching the database.
+"""
+
+import os
+import threading
+
+from alembic import command
+from alembic.config import Config
+
+from models import engine
+
+_lock = threading.Lock()
+_initialized = False
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+
+def alembic_config() -> Config:
+    return Config(ALEMBIC_INI)
+
+
+def init_db() -> None:
+    """Applies pending schema migrations once per process."""
+    global _initialized
+    if _initialized:
+        return
+    with _lock:
+        if not _initialized:
+            config = alembic_config()
+            with engine.begin() as connection:
+                config.attributes["connection"] = connection
+                command.upgrade(config, "head")
+            _initialized = True
@@ -0,0 +1,146 @@
+"""In-process caches for values derived from the database.
+
+Cached values are keyed by a data version stored in the ``app_state`` table.
+Every write that changes the underlying data calls ``bump_data_version`` in
+its session, so all processes using the database see the invalidation.
+Values built from append-only tables are kept by ``IncrementalCache`` and
+only extended by the rows added since.
+"""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import Integer, String, cast, update
+
+from models import AppState
+
+DATA_VERSION_KEY = "data_version"
+# Bumped when groups, their passwords or the list of funds change.
+ACCOUNTS_VERSION_KEY = "accounts_version"
+
+logger = logging.getLogger(__name__)
+
+
+def get_data_version(session, key: str = DATA_VERSION_KEY) -> int:
+    """Returns the current data version."""
+    value = session.query(AppState.value).filter(AppState.key == key).scalar()
+    return int(value) if value else 0
+
+
+def bump_data_version(session, key: str = DATA_VERSION_KEY) -> None:
+    """Increments the data version; takes effect when the session commits."""
+    result = session.execute(
+        update(AppState)
+        .where(AppState.key == key)
+        .values(value=cast(cast(AppState.value, Integer) + 1, String)),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount == 0:
+        session.add(AppState(key=key, value="1"))
+
+
+class VersionedCache:
+    """Holds one value per data version and counts hits and misses."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._version = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(self, version: int, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            if self._version == version:
+                self.hits += 1
+                logger.debug("cache hit: %s (version %s)", self.name, version)
+                return self._value
+            self.misses += 1
+        logger.debug("cache miss: %s (version %s)", self.name, version)
+        value = loader()
+        with self._lock:
+            self._version = version
+            self._value = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._version = None
+            self._value = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "version": self._version,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class IncrementalCache:
+    """Holds a value built from append-only rows, up to a high-water mark.
+
+    When the mark moves, the cached value is extended by the rows up to the
+    new mark instead of being rebuilt. A different ``base``, e.g. after rows
+    were renamed or deleted, builds the value from scratch.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.extensions = 0
+        self.misses = 0
+        self._base = None
+        self._mark = None
+        self._value = None
+        self._lock = threading.Lock()
+
+    def get(
+        self, base: Any, mark: Any, build: Callable[[Optional[Any], Any], Any]
+    ) -> Any:
+        """Returns the value at ``mark``.
+
+        ``build(value, since)`` returns ``value`` extended by the rows after
+        ``since`` up to ``mark``, or a new value if ``value`` is None. It must
+        not modify ``value`` in place.
+        """
+        with self._lock:
+            if self._base == base and self._mark == mark:
+                self.hits += 1
+                logger.debug("cache hit: %s (mark %s)", self.name, mark)
+                return self._value
+            if self._base == base and self._value is not None:
+                self.extensions += 1
+                previous, since = self._value, self._mark
+            else:
+                self.misses += 1
+                previous, since = None, None
+        logger.debug(
+            "cache %s: %s (mark %s)",
+            "miss" if previous is None else "extension",
+            self.name,
+            mark,
+        )
+        value = build(previous, since)
+        with self._lock:
+            self._base = base
+            self._mark = mark
+            self._value = value
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._base = None
+            self._mark = None
+            self._value = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "mark": self._mark,
+            "hits": self.hits,
+            "extensions": self.extensions,
+            "misses": self.misses,
+        }
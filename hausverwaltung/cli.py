@@ -0,0 +1,442 @@
+"""Command line entry point for maintenance tasks and the monthly chores.
+
+Run from the repository root, e.g. ``python hausverwaltung/cli.py rebuild-arrears``.
+Every command accepts ``--json`` for machine readable output, so cron jobs
+can run them without the Streamlit app. With ``--dry-run`` a command runs
+against the configured database as usual, but all of its writes are rolled
+back at the end.
+"""
+
+import argparse
+import getpass
+import json
+import sys
+from contextlib import contextmanager
+from datetime import date
+from typing import Any, Iterable, Iterator
+
+from sqlalchemy import event
+
+import queries
+from bank_import import STATEMENT_ERRORS, import_statement, read_statement
+from bootstrap import init_db
+from database import create_db_engine
+from export import EXPORTS, FORMATS, export_table
+from forecast import FORECAST_YEARS, forecast_funds
+from functions import (
+    add_group,
+    bids_to_rent,
+    check_missing_payments,
+    distribute_funds,
+    rebuild_arrears_ledger,
+    rebuild_fund_snapshots,
+    reconcile_fund_balances,
+)
+from models import BiddingStatus, Group, MonthlyCash, MonthlyGiro, Session, engine
+
+
+def emit(args, payload: Any, lines: Iterable[str] = ()) -> None:
+    """Prints ``payload`` as one JSON document or ``lines`` as plain text."""
+    if args.json:
+        print(json.dumps(payload, default=str, ensure_ascii=False))
+    else:
+        for line in lines:
+            print(line)
+
+
+@contextmanager
+def dry_run() -> Iterator[None]:
+    """Rolls back everything the enclosed block commits through ``Session``.
+
+    Sessions are bound to one connection with an outer transaction, their
+    commits only release savepoints. pysqlite's own transaction handling is
+    switched off for this engine, otherwise savepoints do not work.
+    """
+    dry_run_engine = create_db_engine()
+
+    @event.listens_for(dry_run_engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(dry_run_engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    with dry_run_engine.connect() as connection:
+        transaction = connection.begin()
+        Session.configure(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            yield
+        finally:
+            Session.configure(
+                bind=engine, join_transaction_mode="conditional_savepoint"
+            )
+            transaction.rollback()
+    dry_run_engine.dispose()
+
+
+def rebuild_arrears(args) -> int:
+    mismatches = rebuild_arrears_ledger(check_only=args.check)
+    emit(
+        args,
+        {
+            "mismatches": [
+                {
+                    "group": group_name,
+                    "month": month,
+                    "stored": stored,
+                    "computed": computed,
+                }
+                for group_name, month, stored, computed in mismatches
+            ],
+            "corrected": 0 if args.check else len(mismatches),
+        },
+        [
+            f"{group_name} {month:%m/%Y}: stored {stored}, computed {computed}"
+            for group_name, month, stored, computed in mismatches
+        ]
+        + [
+            (
+                f"{len(mismatches)} mismatches in the arrears ledger."
+                if args.check
+                else f"Arrears ledger rebuilt, {len(mismatches)} mismatches corrected."
+            )
+        ],
+    )
+    return 1 if args.check and mismatches else 0
+
+
+def rebuild_snapshots(args) -> int:
+    rebuild_fund_snapshots()
+    emit(args, {"rebuilt": True}, ["Fund balance snapshots rebuilt."])
+    return 0
+
+
+def reconcile_funds(args) -> int:
+    drift = reconcile_fund_balances(repair=args.repair)
+    if args.repair:
+        summary = f"{len(drift)} fund balances repaired."
+    else:
+        summary = (
+            f"{len(drift)} fund balances differ from their confirmed transactions."
+        )
+    emit(
+        args,
+        {
+            "drift": [
+                {"fund": fund_name, "stored": stored, "confirmed": computed}
+                for fund_name, stored, computed in drift
+            ],
+            "repaired": args.repair,
+        },
+        [
+            f"{fund_name}: stored {stored:.2f}, confirmed {computed:.2f}"
+            for fund_name, stored, computed in drift
+        ]
+        + [summary],
+    )
+    return 1 if drift and not args.repair else 0
+
+
+def missing_payments(args) -> int:
+    missing = check_missing_payments()
+    lines = [
+        f"{group_name} {month:%m/%Y}: {shortfall:.2f} EUR"
+        for group_name, months in missing.items()
+        for month, shortfall in months
+    ]
+    emit(
+        args,
+        {
+            group_name: [
+                {"month": month, "shortfall": shortfall} for month, shortfall in months
+            ]
+            for group_name, months in missing.items()
+        },
+        lines + [f"{len(missing)} groups with missing payments."],
+    )
+    return 1 if missing and args.fail_on_missing else 0
+
+
+def forecast(args) -> int:
+    with Session() as session:
+        projection = forecast_funds(session, args.years)
+    lines = [
+        (
+            f"{fund_name}: target reached {month:%m/%Y}"
+            if month
+            else f"{fund_name}: target not reached within {args.years} years"
+        )
+        for fund_name, month in projection.target_months().items()
+    ]
+    uncovered = projection.uncovered_months()
+    if uncovered:
+        lines.append(
+            "Scheduled cash does not cover the distributions "
+            f"from {uncovered[0]:%m/%Y}."
+        )
+    giro_shortfall = projection.giro_shortfall_months()
+    if giro_shortfall:
+        lines.append(
+            "Scheduled giro does not cover the expenses "
+            f"from {giro_shortfall[0]:%m/%Y}."
+        )
+    emit(args, projection.to_dict(), lines)
+    return 0
+
+
+def distribute(args) -> int:
+    with Session() as session:
+        group = queries.group_by_name(session, args.group)
+        group_id = group.id if group else None
+    if group_id is None:
+        print(f"Unknown group: {args.group}", file=sys.stderr)
+        return 2
+    balances = distribute_funds(group_id)
+    if balances is None:
+        emit(args, {"distributed": False}, ["Nothing to distribute."])
+        return 0
+    emit(
+        args,
+        {"distributed": True, "balances": balances},
+        [f"{fund_name}: {balance:.2f}" for fund_name, balance in balances.items()],
+    )
+    return 0
+
+
+def accept_bids(args) -> int:
+    with Session() as session:
+        if args.round is None:
+            bidding_status = queries.latest_bidding_status(session, "open")
+        else:
+            bidding_status = session.get(BiddingStatus, args.round)
+        if bidding_status is None or bidding_status.status != "open":
+            print("No open bidding round.", file=sys.stderr)
+            return 2
+
+        groups_with_bids = {
+            bid.group_id for bid in queries.bids_for_round(session, bidding_status.id)
+        }
+        groups_missing_bids = [
+            group.name
+            for group in queries.active_groups(session)
+            if group.id not in groups_with_bids
+        ]
+        if groups_missing_bids:
+            emit(
+                args,
+                {"accepted": False, "missing_bids": groups_missing_bids},
+                ["Not all bids submitted. Groups without a bid:"] + groups_missing_bids,
+            )
+            return 1
+
+        bidding_status.status = "accepted"
+        bids_to_rent(bidding_status, session)
+
+        schedules = {}
+        for model, key in ((MonthlyCash, "cash"), (MonthlyGiro, "giro")):
+            for group_name, amount in (
+                session.query(Group.name, model.amount)
+                .join(model, model.group_id == Group.id)
+                .filter(
+                    model.group_id.in_(groups_with_bids),
+                    model.start_date == bidding_status.period_start,
+                )
+            ):
+                schedules.setdefault(group_name, {})[key] = amount
+        emit(
+            args,
+            {
+                "accepted": True,
+                "round": bidding_status.id,
+                "period_start": bidding_status.period_start,
+                "period_end": bidding_status.period_end,
+                "schedules": schedules,
+            },
+            [
+                f"{group_name}: cash {amounts['cash']:.2f}, giro {amounts['giro']:.2f}"
+                for group_name, amounts in sorted(schedules.items())
+            ]
+            + [f"Bidding round {bidding_status.id} accepted."],
+        )
+    return 0
+
+
+def import_bank_statement(args) -> int:
+    with open(args.path, "rb") as statement:
+        try:
+            result = import_statement(read_statement(statement, args.path))
+        except STATEMENT_ERRORS as error:
+            print(f"Cannot read {args.path}: {error}", file=sys.stderr)
+            return 2
+    emit(
+        args,
+        result.to_dict(),
+        [
+            f"{line.booking_date:%d.%m.%Y} {line.amount:.2f} {line.name}: "
+            f"{line.reference}"
+            for line in result.unmatched_lines
+        ]
+        + [
+            f"{result.imported} deposits imported, {result.duplicates} already "
+            f"imported, {result.unmatched} not matched to a group."
+        ],
+    )
+    return 0
+
+
+def export(args) -> int:
+    if args.output is None:
+        export_table(args.table, sys.stdout.buffer, args.format, args.start, args.end)
+        return 0
+    with open(args.output, "wb") as output:
+        rows = export_table(args.table, output, args.format, args.start, args.end)
+    emit(
+        args,
+        {"table": args.table, "rows": rows, "output": args.output},
+        [f"{rows} rows of {args.table} written to {args.output}."],
+    )
+    return 0
+
+
+def create_group(args) -> int:
+    password = args.password or getpass.getpass(f"Passwort für {args.name}: ")
+    add_group(args.name, password, args.role)
+    emit(
+        args,
+        {"group": args.name, "role": args.role},
+        [f"Group {args.name} added."],
+    )
+    return 0
+
+
+def main(argv=None) -> int:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--json", action="store_true", help="print the result as one JSON document"
+    )
+    common.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="run the command but roll back all of its changes",
+    )
+
+    parser = argparse.ArgumentParser(prog="hausverwaltung")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = subparsers.add_parser(
+        "rebuild-arrears",
+        parents=[common],
+        help="regenerate the arrears ledger from raw schedules and transactions",
+    )
+    rebuild.add_argument(
+        "--check",
+        action="store_true",
+        help="only compare the stored ledger, exit with 1 on differences",
+    )
+    rebuild.set_defaults(handler=rebuild_arrears)
+
+    snapshots = subparsers.add_parser(
+        "rebuild-fund-snapshots",
+        parents=[common],
+        help="regenerate the daily fund balance snapshots from confirmed transactions",
+    )
+    snapshots.set_defaults(handler=rebuild_snapshots)
+
+    reconcile = subparsers.add_parser(
+        "reconcile-funds",
+        parents=[common],
+        help="compare stored fund balances with their confirmed transactions",
+    )
+    reconcile.add_argument(
+        "--repair",
+        action="store_true",
+        help="set drifted balances to the sum of confirmed transactions",
+    )
+    reconcile.set_defaults(handler=reconcile_funds)
+
+    missing = subparsers.add_parser(
+        "missing-payments",
+        parents=[common],
+        help="list the months in which groups paid less than scheduled",
+    )
+    missing.add_argument(
+        "--fail-on-missing",
+        action="store_true",
+        help="exit with 1 if any payment is missing",
+    )
+    missing.set_defaults(handler=missing_payments)
+
+    projection = subparsers.add_parser(
+        "forecast",
+        parents=[common],
+        help="project the fund balances month by month",
+    )
+    projection.add_argument("--years", type=int, default=FORECAST_YEARS)
+    projection.set_defaults(handler=forecast)
+
+    distribution = subparsers.add_parser(
+        "distribute-funds",
+        parents=[common],
+        help="distribute the Einzahlungsfonds to the other funds",
+    )
+    distribution.add_argument(
+        "--group", required=True, help="group the transactions are booked for"
+    )
+    distribution.set_defaults(handler=distribute)
+
+    bids = subparsers.add_parser(
+        "bids-to-rent",
+        parents=[common],
+        help="accept the open bidding round and set the new monthly payments",
+    )
+    bids.add_argument(
+        "--round", type=int, help="id of the bidding round, default: latest open"
+    )
+    bids.set_defaults(handler=accept_bids)
+
+    statement = subparsers.add_parser(
+        "import-statement",
+        parents=[common],
+        help="add the deposits of a CSV or CAMT.053 bank statement",
+    )
+    statement.add_argument("path", help="CAMT.053 if it ends in .xml, else CSV")
+    statement.set_defaults(handler=import_bank_statement)
+
+    table_export = subparsers.add_parser(
+        "export",
+        parents=[common],
+        help="write a ledger, schedule, bid or change log table to CSV or Parquet",
+    )
+    table_export.add_argument("table", choices=list(EXPORTS))
+    table_export.add_argument("--format", choices=list(FORMATS), default="csv")
+    table_export.add_argument(
+        "--from",
+        dest="start",
+        type=date.fromisoformat,
+        help="first day, YYYY-MM-DD",
+    )
+    table_export.add_argument(
+        "--to", dest="end", type=date.fromisoformat, help="last day, YYYY-MM-DD"
+    )
+    table_export.add_argument("--output", help="file to write, default: stdout")
+    table_export.set_defaults(handler=export)
+
+    group = subparsers.add_parser(
+        "add-group", parents=[common], help="add a group that can log in"
+    )
+    group.add_argument("name")
+    group.add_argument("--password", help="default: prompt for it")
+    group.add_argument("--role", choices=["user", "admin"], default="user")
+    group.set_defaults(handler=create_group)
+
+    args = parser.parse_args(argv)
+    init_db()
+    if args.dry_run:
+        with dry_run():
+            return args.handler(args)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
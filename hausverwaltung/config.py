@@ -0,0 +1,24 @@
+"""Runtime configuration, read from environment variables."""
+
+import os
+
+# Path of the SQLite database file; a full SQLAlchemy URL takes precedence.
+DATABASE_PATH = os.environ.get("HAUSVERWALTUNG_DB_PATH", "cash_management.db")
+DATABASE_URL = os.environ.get(
+    "HAUSVERWALTUNG_DATABASE_URL", f"sqlite:///{DATABASE_PATH}"
+)
+
+# SQLite tuning, applied to every new connection.
+SQLITE_JOURNAL_MODE = os.environ.get("HAUSVERWALTUNG_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("HAUSVERWALTUNG_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(
+    os.environ.get("HAUSVERWALTUNG_SQLITE_BUSY_TIMEOUT_MS", "10000")
+)
+SQLITE_CACHE_SIZE_KIB = int(
+    os.environ.get("HAUSVERWALTUNG_SQLITE_CACHE_SIZE_KIB", "32768")
+)
+SQLITE_MMAP_SIZE = int(os.environ.get("HAUSVERWALTUNG_SQLITE_MMAP_SIZE", "268435456"))
+SQLITE_FOREIGN_KEYS = os.environ.get("HAUSVERWALTUNG_SQLITE_FOREIGN_KEYS", "1") == "1"
+
+# Write one JSON log line with query and render timings per displayed tab.
+PROFILE_LOG = os.environ.get("HAUSVERWALTUNG_PROFILE_LOG", "0") == "1"
@@ -0,0 +1,32 @@
+"""Engine construction for the configured database."""
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+
+import config
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA journal_mode = {config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA cache_size = -{config.SQLITE_CACHE_SIZE_KIB}")
+    cursor.execute(f"PRAGMA mmap_size = {config.SQLITE_MMAP_SIZE}")
+    cursor.execute(
+        f"PRAGMA foreign_keys = {'ON' if config.SQLITE_FOREIGN_KEYS else 'OFF'}"
+    )
+    cursor.close()
+
+
+def create_db_engine(url: str = config.DATABASE_URL, **kwargs) -> Engine:
+    """Creates an engine; SQLite connections get the configured pragmas.
+
+    With WAL journaling readers no longer block writers and vice versa, and
+    the busy timeout lets concurrent writers wait for each other instead of
+    failing with "database is locked".
+    """
+    engine = create_engine(url, **kwargs)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", _apply_sqlite_pragmas)
+    return engine
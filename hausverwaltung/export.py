@@ -0,0 +1,151 @@
+"""Export of ledgers, payment schedules, bids and change logs.
+
+Rows are fetched ``CHUNK_SIZE`` at a time and written chunk by chunk, to CSV
+or as one Parquet row group per chunk, so the memory needed does not depend
+on the size of the table. A date range is applied in SQL: rows dated in the
+range, or schedules overlapping it, are exported.
+"""
+
+import csv
+import io
+from datetime import date, datetime, time, timedelta
+from typing import IO, Any, Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, select
+from sqlalchemy.sql import Select
+
+from models import (
+    Bid,
+    Expense,
+    ExpenseChangeLog,
+    Fund,
+    FundChangeLog,
+    Group,
+    MonthlyCash,
+    MonthlyGiro,
+    Session,
+    Transaction,
+)
+
+CHUNK_SIZE = 5000
+
+# Table name -> model, its date column and, for schedules, the end column.
+EXPORTS: Dict[str, Tuple[Any, Any, Any]] = {
+    "transactions": (Transaction, Transaction.date, None),
+    "fund_changes": (FundChangeLog, FundChangeLog.timestamp, None),
+    "expense_changes": (ExpenseChangeLog, ExpenseChangeLog.timestamp, None),
+    "monthly_cash": (MonthlyCash, MonthlyCash.start_date, MonthlyCash.end_date),
+    "monthly_giro": (MonthlyGiro, MonthlyGiro.start_date, MonthlyGiro.end_date),
+    "bids": (Bid, Bid.submitted_at, None),
+}
+
+# Foreign keys that are exported with the name of the referenced row.
+_NAMED_KEYS = {
+    "fund_id": (Fund, "fund"),
+    "group_id": (Group, "group"),
+    "expense_id": (Expense, "expense"),
+}
+
+
+def _bound(column, day: date, upper: bool):
+    """Compares a date or timestamp column with the start or end of a day."""
+    if isinstance(column.type, DateTime):
+        if upper:
+            return column < datetime.combine(day + timedelta(days=1), time.min)
+        return column >= datetime.combine(day, time.min)
+    return column <= day if upper else column >= day
+
+
+def export_query(
+    table: str, start: Optional[date] = None, end: Optional[date] = None
+) -> Select:
+    """Returns the statement selecting the rows of ``table`` in the range."""
+    model, period_start, period_end = EXPORTS[table]
+    statement = select(*model.__table__.columns)
+    for column in model.__table__.columns:
+        if column.name in _NAMED_KEYS:
+            target, label = _NAMED_KEYS[column.name]
+            statement = statement.add_columns(target.name.label(label)).outerjoin(
+                target, target.id == column
+            )
+    if start is not None:
+        last_day = period_end if period_end is not None else period_start
+        statement = statement.where(_bound(last_day, start, upper=False))
+    if end is not None:
+        statement = statement.where(_bound(period_start, end, upper=True))
+    return statement.order_by(model.id)
+
+
+def _chunks(statement: Select) -> Iterator[Sequence]:
+    with Session() as session:
+        result = session.execute(statement.execution_options(yield_per=CHUNK_SIZE))
+        yield from result.partitions()
+
+
+def _arrow_type(sql_type) -> pa.DataType:
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, Float):
+        return pa.float64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(sql_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def write_csv(statement: Select, file: IO[bytes]) -> int:
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(column.name for column in statement.selected_columns)
+    rows = 0
+    for chunk in _chunks(statement):
+        writer.writerows(chunk)
+        rows += len(chunk)
+    text.flush()
+    text.detach()
+    return rows
+
+
+def write_parquet(statement: Select, file: IO[bytes]) -> int:
+    schema = pa.schema(
+        [
+            (column.name, _arrow_type(column.type))
+            for column in statement.selected_columns
+        ]
+    )
+    rows = 0
+    with pq.ParquetWriter(file, schema) as writer:
+        for chunk in _chunks(statement):
+            writer.write_batch(
+                pa.record_batch(
+                    [
+                        pa.array(values, type=field.type)
+                        for values, field in zip(zip(*chunk), schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            rows += len(chunk)
+    return rows
+
+
+FORMATS: Dict[str, Callable[[Select, IO[bytes]], int]] = {
+    "csv": write_csv,
+    "parquet": write_parquet,
+}
+
+
+def export_table(
+    table: str,
+    file: IO[bytes],
+    file_format: str = "csv",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> int:
+    """Writes the rows of ``table`` in the range to ``file``; returns their count."""
+    return FORMATS[file_format](export_query(table, start, end), file)
@@ -0,0 +1,172 @@
+"""Month by month forecast of the fund balances.
+
+Every month the scheduled cash payments of all groups flow into the
+Einzahlungsfonds, which is then distributed to the other funds in proportion
+to their yearly targets, as ``distribute_funds`` does. The balances of all
+funds in all months follow from the cumulative inflow in one step, without
+a loop over months. The scheduled giro payments are compared with the
+expenses they pay for.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from plotly.graph_objects import Figure
+
+import queries
+from functions import house_totals
+from schedules import resolve_schedules
+
+DEPOSIT_FUND = "Einzahlungsfonds"
+FORECAST_YEARS = 3
+# Differences below half a cent are rounding, not a shortfall.
+TOLERANCE = 0.005
+
+
+class FundForecast:
+    """Projected balances at the end of each month, one row per fund.
+
+    ``reserve`` is what the Einzahlungsfonds has received so far beyond the
+    planned distributions of one twelfth of the yearly targets per month.
+    """
+
+    def __init__(
+        self,
+        months: np.ndarray,
+        fund_names: List[str],
+        targets: np.ndarray,
+        balances: np.ndarray,
+        cash: np.ndarray,
+        giro: np.ndarray,
+        planned: np.ndarray,
+        expenses: np.ndarray,
+        reserve: np.ndarray,
+    ):
+        self.months = months
+        self.fund_names = fund_names
+        self.targets = targets
+        self.balances = balances
+        self.cash = cash
+        self.giro = giro
+        self.planned = planned
+        self.expenses = expenses
+        self.reserve = reserve
+
+    def _dates(self, mask: Optional[np.ndarray] = None) -> List[date]:
+        months = self.months if mask is None else self.months[mask]
+        return months.astype("datetime64[D]").tolist()
+
+    def target_months(self) -> Dict[str, Optional[date]]:
+        """Returns the first month at whose end each fund holds its yearly
+        target, None if it does not within the forecast."""
+        reached = self.balances >= self.targets[:, None] - TOLERANCE
+        first = reached.argmax(axis=1)
+        months = self._dates()
+        return {
+            name: months[column] if reached[row, column] else None
+            for row, (name, column) in enumerate(zip(self.fund_names, first))
+        }
+
+    def uncovered_months(self) -> List[date]:
+        """Months by which the cash paid in falls short of the planned
+        distributions."""
+        return self._dates(self.reserve < -TOLERANCE)
+
+    def giro_shortfall_months(self) -> List[date]:
+        """Months in which the giro payments do not cover the expenses."""
+        return self._dates(self.giro < self.expenses - TOLERANCE)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Returns one row per fund and month with balance and target."""
+        return pd.DataFrame(
+            {
+                "month": np.tile(self.months, len(self.fund_names)).astype(
+                    "datetime64[ns]"
+                ),
+                "fund": np.repeat(self.fund_names, len(self.months)),
+                "balance": self.balances.ravel(),
+                "target": np.repeat(self.targets, len(self.months)),
+            }
+        )
+
+    def to_dict(self) -> Dict:
+        return {
+            "months": self._dates(),
+            "balances": {
+                name: balances.round(2).tolist()
+                for name, balances in zip(self.fund_names, self.balances)
+            },
+            "target_months": self.target_months(),
+            "uncovered_months": self.uncovered_months(),
+            "giro_shortfall_months": self.giro_shortfall_months(),
+        }
+
+
+def forecast_funds(
+    session, years: int = FORECAST_YEARS, start: Optional[date] = None
+) -> FundForecast:
+    """Projects the fund balances from the current ones over ``years`` years.
+
+    The forecast starts with the month after ``start``, by default today.
+    """
+    start = start or date.today()
+    months = np.arange(12 * years) + np.datetime64(start, "M") + 1
+    schedule = resolve_schedules(
+        session,
+        months[0].astype("datetime64[D]").item(),
+        months[-1].astype("datetime64[D]").item(),
+    )
+    cash = np.nansum(schedule.amounts["cash"], axis=0)
+    giro = np.nansum(schedule.amounts["giro"], axis=0)
+
+    deposit_balance = 0.0
+    funds = []
+    for fund in queries.all_funds(session):
+        if fund.name == DEPOSIT_FUND:
+            deposit_balance = fund.current_balance or 0.0
+        else:
+            funds.append(fund)
+    balances = np.array([fund.current_balance or 0.0 for fund in funds])
+    targets = np.array([fund.yearly_target or 0.0 for fund in funds])
+    total_target = targets.sum()
+    ratios = targets / total_target if total_target else np.zeros(len(funds))
+
+    # The Einzahlungsfonds is emptied every month, its balance with the first.
+    distributed = np.cumsum(cash)
+    distributed += deposit_balance
+    planned = np.full(len(months), total_target / 12)
+    expenses = np.full(
+        len(months), (house_totals(session)["total_yearly_expenses"] or 0) / 12
+    )
+    return FundForecast(
+        months,
+        [fund.name for fund in funds],
+        targets,
+        balances[:, None] + ratios[:, None] * distributed,
+        cash,
+        giro,
+        planned,
+        expenses,
+        distributed - np.cumsum(planned),
+    )
+
+
+def forecast_chart(forecast: FundForecast) -> Figure:
+    """Draws the projected balance of every fund."""
+    return px.line(
+        forecast.to_frame(),
+        x="month",
+        y="balance",
+        color="fund",
+        title="Prognose der Fonds-Salden",
+        labels={
+            "month": "Monat",
+            "balance": "Saldo",
+            "fund": "Fonds",
+            "target": "Jährliches Ziel",
+        },
+        hover_data={"target": True},
+    )
@@ -1,27 +1,40 @@
 import json
 import math
 from datetime import datetime, timedelta, date
-from typing import Optional, Literal, List, Dict, Tuple
+from typing import Optional, Literal, List, Dict, Tuple, Union
 
-from sqlalchemy import func
-from sqlalchemy.orm import sessionmaker
+import numpy as np
+from sqlalchemy import func, update, insert, select
+from sqlalchemy.orm import selectinload
 from streamlit_authenticator.utilities import hasher
 
+from cache import (
+    ACCOUNTS_VERSION_KEY,
+    VersionedCache,
+    bump_data_version,
+    get_data_version,
+)
 from models import (
     Group,
     Fund,
     Transaction,
+    Transfer,
     Expense,
     Room,
+    Person,
+    PeopleCategory,
+    Bid,
     BiddingStatus,
     MonthlyCash,
     MonthlyGiro,
-    engine,
+    Session,
     ExpenseChangeLog,
     FundChangeLog,
+    ArrearsLedger,
+    AppState,
+    FundBalanceSnapshot,
 )
-
-Session = sessionmaker(bind=engine)
+from schedules import ScheduleIssue, resolve_schedules
 
 
 def add_group(name: str, password: str, role: Literal["user", "admin"]) -> None:
@@ -30,6 +43,8 @@ def add_group(name: str, password: str, role: Literal["user", "admin"]) -> None:
     with Session() as session:
         group = Group(name=name, password=hashed_password, role=role, active=True)
         session.add(group)
+        bump_data_version(session)
+        bump_data_version(session, ACCOUNTS_VERSION_KEY)
         session.commit()
 
 
@@ -42,6 +57,8 @@ def add_monthly_amount(
             group_id=group_id, amount=amount, start_date=start_date, end_date=end_date
         )
         session.add(monthly_amount)
+        session.flush()
+        refresh_arrears(session, group_id, start_date, end_date)
         session.commit()
 
 
@@ -54,11 +71,88 @@ def add_fund(name: str, yearly_target: float) -> None:
             history=json.dumps({datetime.now().year: yearly_target}),
         )
         session.add(fund)
+        bump_data_version(session)
+        bump_data_version(session, ACCOUNTS_VERSION_KEY)
+        session.commit()
+
+
+def confirm_transactions(transaction_ids: List[int]) -> int:
+    """Confirms transactions together with the other legs of their transfers.
+
+    The legs are selected and then confirmed with one UPDATE by id, the fund
+    balances are moved by the summed amounts per fund in SQL. Legs that are
+    already confirmed are left alone, so confirming twice does not book
+    twice. Returns the number of confirmed legs.
+    """
+    if not transaction_ids:
+        return 0
+    with Session() as session:
+        transfer_ids = (
+            select(Transaction.transfer_id)
+            .where(Transaction.id.in_(transaction_ids))
+            .where(Transaction.transfer_id != None)
+        )
+        pending_legs = select(
+            Transaction.id,
+            Transaction.fund_id,
+            Transaction.date,
+            Transaction.amount,
+            Transaction.group_id,
+        ).where(
+            Transaction.confirmed == False,
+            Transaction.id.in_(transaction_ids)
+            | Transaction.transfer_id.in_(transfer_ids),
+        )
+        while True:
+            legs = session.execute(pending_legs).all()
+            if not legs:
+                return 0
+            leg_ids = [leg.id for leg in legs]
+            confirmed = session.execute(
+                update(Transaction)
+                .where(Transaction.id.in_(leg_ids), Transaction.confirmed == False)
+                .values(confirmed=True),
+                execution_options={"synchronize_session": False},
+            ).rowcount
+            if confirmed == len(legs):
+                break
+            # Another session confirmed some of the legs in between.
+            session.rollback()
+
+        fund_delta = (
+            select(func.sum(Transaction.amount))
+            .where(Transaction.fund_id == Fund.id, Transaction.id.in_(leg_ids))
+            .scalar_subquery()
+        )
+        session.execute(
+            update(Fund)
+            .where(Fund.id.in_({leg.fund_id for leg in legs}))
+            .values(current_balance=Fund.current_balance + fund_delta),
+            execution_options={"synchronize_session": False},
+        )
+
+        deposit_fund_id = _deposit_fund_id(session)
+        deposit_dates: Dict[int, List[date]] = {}
+        for leg in legs:
+            if leg.fund_id == deposit_fund_id:
+                deposit_dates.setdefault(leg.group_id, []).append(leg.date)
+        for group_id, dates in deposit_dates.items():
+            refresh_arrears(session, group_id, min(dates), max(dates))
+        record_fund_snapshots(
+            session, [(leg.fund_id, leg.date, leg.amount) for leg in legs]
+        )
+
         session.commit()
+        return len(legs)
 
 
 def confirm_transaction(transaction_id: int) -> None:
     """Confirms a transaction."""
+    confirm_transactions([transaction_id])
+
+
+def delete_transaction(transaction_id: int) -> None:
+    """Deletes an unconfirmed transaction together with the other legs of its transfer."""
     with Session() as session:
         transaction = (
             session.query(Transaction).filter(Transaction.id == transaction_id).first()
@@ -66,15 +160,29 @@ def confirm_transaction(transaction_id: int) -> None:
         if transaction.transfer_id:
             related_transactions = (
                 session.query(Transaction)
-                .filter(Transaction.transfer_id == transaction.transfer_id)
+                .filter(
+                    Transaction.transfer_id == transaction.transfer_id,
+                    Transaction.confirmed == False,
+                )
                 .all()
             )
         else:
             related_transactions = [transaction]
+        deposit_fund_id = _deposit_fund_id(session)
+        deposits = [
+            (tx.group_id, tx.date)
+            for tx in related_transactions
+            if tx.fund_id == deposit_fund_id
+        ]
         for tx in related_transactions:
-            tx.confirmed = True
-            fund = session.query(Fund).filter(Fund.id == tx.fund_id).first()
-            fund.current_balance += tx.amount
+            session.delete(tx)
+        session.flush()
+        if transaction.transfer_id:
+            session.query(Transfer).filter(
+                Transfer.id == transaction.transfer_id, ~Transfer.transactions.any()
+            ).delete(synchronize_session=False)
+        for group_id, tx_date in deposits:
+            refresh_arrears(session, group_id, tx_date, tx_date)
 
         session.commit()
 
@@ -94,19 +202,30 @@ def distribute_funds(group_id: int) -> Optional[Dict[str, float]]:
             return
 
         einzahlungstopf_balance = einzahlungsfonds.current_balance
+        now = datetime.now()
+        specs = []
         for fund in funds:
             ratio = fund.yearly_target / total_target
             amount = round(ratio * einzahlungstopf_balance)
-            add_transaction(
-                fund.id, amount, datetime.now(), group_id, f"Distribution of deposits"
+            specs.append(
+                {
+                    "fund_id": fund.id,
+                    "amount": amount,
+                    "date": now,
+                    "group_id": group_id,
+                    "comment": "Distribution of deposits",
+                }
             )
-            add_transaction(
-                einzahlungsfonds.id,
-                -amount,
-                datetime.now(),
-                group_id,
-                f"Distributed to {fund.name}",
+            specs.append(
+                {
+                    "fund_id": einzahlungsfonds.id,
+                    "amount": -amount,
+                    "date": now,
+                    "group_id": group_id,
+                    "comment": f"Distributed to {fund.name}",
+                }
             )
+        add_transactions_bulk(session, specs)
 
         einzahlungsfonds.current_balance = 0
         session.commit()
@@ -115,73 +234,474 @@ def distribute_funds(group_id: int) -> Optional[Dict[str, float]]:
         return result
 
 
+ARREARS_START = date(year=2022, month=1, day=1)
+ARREARS_THROUGH_KEY = "arrears_ledger_through"
+
+
+def _next_month(day: date) -> date:
+    """Returns the first day of the month following ``day``."""
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _deposit_fund_id(session) -> Optional[int]:
+    return session.query(Fund.id).filter(Fund.name == "Einzahlungsfonds").scalar()
+
+
+def _compute_arrears(
+    session,
+    first_month: date,
+    last_month: date,
+    group_ids: Optional[List[int]] = None,
+) -> List[Dict]:
+    """Computes due and deposited amounts per group and month from raw data.
+
+    The cash schedules are resolved into a group by month matrix and the
+    deposits into the Einzahlungsfonds summed per group and month in SQL.
+    """
+    schedule = resolve_schedules(
+        session, first_month, last_month, group_ids, schedules=("cash",)
+    )
+    due = schedule.amounts["cash"]
+
+    deposits: Dict[Tuple[int, str], float] = {}
+    deposit_fund_id = _deposit_fund_id(session)
+    if deposit_fund_id and not np.isnan(due).all():
+        month = func.strftime("%Y-%m", Transaction.date)
+        deposit_query = (
+            session.query(Transaction.group_id, month, func.sum(Transaction.amount))
+            .filter(
+                Transaction.fund_id == deposit_fund_id,
+                Transaction.date >= first_month,
+                Transaction.date < _next_month(last_month),
+            )
+            .group_by(Transaction.group_id, month)
+        )
+        if group_ids is not None:
+            deposit_query = deposit_query.filter(Transaction.group_id.in_(group_ids))
+        deposits = {
+            (row_group_id, month_key): total
+            for row_group_id, month_key, total in deposit_query
+        }
+
+    months = schedule.months.astype("datetime64[D]").tolist()
+    rows = []
+    for row, column in zip(*np.nonzero(~np.isnan(due))):
+        row_group_id = int(schedule.group_ids[row])
+        month = months[column]
+        required_amount = float(due[row, column])
+        deposited_amount = deposits.get((row_group_id, month.strftime("%Y-%m")), 0)
+        rows.append(
+            {
+                "group_id": row_group_id,
+                "month": month,
+                "amount_due": required_amount,
+                "amount_deposited": deposited_amount,
+                "shortfall": max(required_amount - deposited_amount, 0),
+            }
+        )
+    return rows
+
+
+def _arrears_target_month() -> date:
+    """Returns the latest month that is due, i.e. has started before today."""
+    return (datetime.now().date() - timedelta(days=1)).replace(day=1)
+
+
+def _arrears_through(session) -> Optional[date]:
+    value = session.get(AppState, ARREARS_THROUGH_KEY)
+    return date.fromisoformat(value.value) if value else None
+
+
+def _lock_arrears_through(session) -> Optional[date]:
+    """Takes the write lock by rewriting the high-water mark, then re-reads it.
+
+    A session extending the ledger concurrently has to wait until the other
+    one has committed and then sees its mark, instead of materializing the
+    same months from a stale read.
+    """
+    session.execute(
+        update(AppState)
+        .where(AppState.key == ARREARS_THROUGH_KEY)
+        .values(value=AppState.value),
+        execution_options={"synchronize_session": False},
+    )
+    value = session.get(AppState, ARREARS_THROUGH_KEY, populate_existing=True)
+    return date.fromisoformat(value.value) if value else None
+
+
+def _set_arrears_through(session, month: date) -> None:
+    session.merge(AppState(key=ARREARS_THROUGH_KEY, value=month.isoformat()))
+
+
+def _update_payment_cursors(
+    session, through: date, group_ids: Optional[List[int]] = None
+) -> None:
+    """Moves ``Group.last_full_payment_date`` to the first month with a shortfall.
+
+    Groups without any outstanding month are paid up to the month after the
+    ledger's high-water mark.
+    """
+    first_open_month = (
+        select(func.min(ArrearsLedger.month))
+        .where(ArrearsLedger.group_id == Group.id, ArrearsLedger.shortfall > 0)
+        .scalar_subquery()
+    )
+    statement = update(Group).values(
+        last_full_payment_date=func.coalesce(first_open_month, _next_month(through))
+    )
+    if group_ids is not None:
+        statement = statement.where(Group.id.in_(group_ids))
+    session.execute(statement, execution_options={"synchronize_session": False})
+
+
+def refresh_arrears(
+    session,
+    group_id: Union[int, List[int]],
+    start: date,
+    end: Optional[date] = None,
+) -> None:
+    """Recomputes the arrears ledger of a group for the months between start and end.
+
+    ``group_id`` may also be a list of groups, which are refreshed together.
+    Only months that are already materialized are touched; the caller commits.
+    The caller must have written before, so that the high-water mark cannot
+    move while the months are recomputed.
+    """
+    through = _arrears_through(session)
+    if through is None:
+        return
+    if isinstance(start, datetime):
+        start = start.date()
+    if isinstance(end, datetime):
+        end = end.date()
+    first_month = max(start.replace(day=1), ARREARS_START)
+    last_month = min(end.replace(day=1), through) if end else through
+    if first_month > last_month:
+        return
+
+    group_ids = group_id if isinstance(group_id, list) else [group_id]
+    session.query(ArrearsLedger).filter(
+        ArrearsLedger.group_id.in_(group_ids),
+        ArrearsLedger.month >= first_month,
+        ArrearsLedger.month <= last_month,
+    ).delete(synchronize_session=False)
+    rows = _compute_arrears(session, first_month, last_month, group_ids)
+    if rows:
+        session.execute(insert(ArrearsLedger), rows)
+    _update_payment_cursors(session, through, group_ids)
+
+
+def _extend_arrears_ledger(session) -> None:
+    """Materializes the months that became due since the last extension."""
+    target = _arrears_target_month()
+    through = _arrears_through(session)
+    if through is not None and through >= target:
+        return
+    through = _lock_arrears_through(session)
+    if through is not None and through >= target:
+        return
+    first_month = _next_month(through) if through else ARREARS_START
+    if first_month <= target:
+        rows = _compute_arrears(session, first_month, target)
+        if rows:
+            session.execute(insert(ArrearsLedger), rows)
+    _set_arrears_through(session, target)
+    session.flush()
+    _update_payment_cursors(session, target)
+
+
+def rebuild_arrears_ledger(
+    check_only: bool = False,
+) -> List[Tuple[str, date, Optional[float], Optional[float]]]:
+    """Regenerates the arrears ledger from raw schedules and transactions.
+
+    Returns the months where the stored shortfall differs from the recomputed
+    one as ``(group_name, month, stored, computed)``. With ``check_only`` the
+    ledger is left untouched.
+    """
+    target = _arrears_target_month()
+    with Session() as session:
+        if not check_only:
+            _lock_arrears_through(session)
+        rows = _compute_arrears(session, ARREARS_START, target)
+        computed = {(row["group_id"], row["month"]): row["shortfall"] for row in rows}
+        stored = {
+            (group_id, month): shortfall
+            for group_id, month, shortfall in session.query(
+                ArrearsLedger.group_id, ArrearsLedger.month, ArrearsLedger.shortfall
+            )
+        }
+        group_names = dict(session.query(Group.id, Group.name))
+        mismatches = [
+            (
+                group_names.get(key[0], str(key[0])),
+                key[1],
+                stored.get(key),
+                computed.get(key),
+            )
+            for key in sorted(set(computed) | set(stored))
+            if stored.get(key) != computed.get(key)
+        ]
+
+        if not check_only:
+            session.query(ArrearsLedger).delete(synchronize_session=False)
+            if rows:
+                session.execute(insert(ArrearsLedger), rows)
+            _set_arrears_through(session, target)
+            session.flush()
+            _update_payment_cursors(session, target)
+            session.commit()
+        return mismatches
+
+
 def check_missing_payments() -> Dict[str, List[Tuple[date, float]]]:
-    """Checks for missing payments from all groups."""
+    """Checks for missing payments from all groups.
+
+    Reads the outstanding months from the arrears ledger, materializing
+    months that became due since the last call first.
+    """
     with Session() as session:
-        groups = session.query(Group).all()
-        einzahlungsfonds = (
-            session.query(Fund).filter(Fund.name == "Einzahlungsfonds").first()
-        )
+        _extend_arrears_ledger(session)
+        session.commit()
 
         missing_payments = {}
-        current_year = date(year=2022, month=1, day=1)
+        for group_name, month, shortfall in (
+            session.query(Group.name, ArrearsLedger.month, ArrearsLedger.shortfall)
+            .join(Group, Group.id == ArrearsLedger.group_id)
+            .filter(ArrearsLedger.shortfall > 0)
+            .order_by(ArrearsLedger.group_id, ArrearsLedger.month)
+        ):
+            missing_payments.setdefault(group_name, []).append((month, shortfall))
+
+        return missing_payments
+
+
+def schedule_issues() -> List[ScheduleIssue]:
+    """Returns the overlaps and gaps in the payment schedules of all groups.
+
+    Schedules running between the start of the arrears ledger and the end of
+    next year are checked.
+    """
+    with Session() as session:
+        return resolve_schedules(
+            session, ARREARS_START, date(datetime.now().year + 1, 12, 1)
+        ).issues
+
 
-        for group in groups:
-            last_payment_date = (
-                group.last_full_payment_date
-                if group.last_full_payment_date
-                else current_year
+FUND_SNAPSHOTS_KEY = "fund_snapshots_built"
+
+
+def record_fund_snapshots(session, postings: List[Tuple[int, date, float]]) -> None:
+    """Books confirmed ``(fund_id, date, amount)`` postings into the daily snapshots.
+
+    The snapshot of the posting day is created or adjusted and the balances of
+    all later days of the fund are shifted by the amount. The caller commits.
+    """
+    if session.get(AppState, FUND_SNAPSHOTS_KEY) is None:
+        return
+    deltas: Dict[Tuple[int, date], float] = {}
+    for fund_id, day, amount in postings:
+        if isinstance(day, datetime):
+            day = day.date()
+        deltas[(fund_id, day)] = deltas.get((fund_id, day), 0) + amount
+
+    for (fund_id, day), amount in sorted(deltas.items()):
+        snapshot = (
+            session.query(FundBalanceSnapshot)
+            .filter(
+                FundBalanceSnapshot.fund_id == fund_id,
+                FundBalanceSnapshot.date == day,
             )
-            monthly_amounts = (
-                session.query(MonthlyCash)
+            .first()
+        )
+        if snapshot:
+            snapshot.amount += amount
+            snapshot.balance += amount
+        else:
+            previous_balance = (
+                session.query(FundBalanceSnapshot.balance)
                 .filter(
-                    MonthlyCash.group_id == group.id,
-                    MonthlyCash.end_date >= last_payment_date,
+                    FundBalanceSnapshot.fund_id == fund_id,
+                    FundBalanceSnapshot.date < day,
                 )
-                .all()
+                .order_by(FundBalanceSnapshot.date.desc())
+                .limit(1)
+                .scalar()
             )
-
-            while last_payment_date < datetime.now().date():
-                current_monthly_amount = next(
-                    (
-                        amount
-                        for amount in monthly_amounts
-                        if amount.start_date <= last_payment_date <= amount.end_date
-                    ),
-                    None,
+            session.add(
+                FundBalanceSnapshot(
+                    fund_id=fund_id,
+                    date=day,
+                    amount=amount,
+                    balance=(previous_balance or 0) + amount,
                 )
+            )
+        session.execute(
+            update(FundBalanceSnapshot)
+            .where(
+                FundBalanceSnapshot.fund_id == fund_id,
+                FundBalanceSnapshot.date > day,
+            )
+            .values(balance=FundBalanceSnapshot.balance + amount),
+            execution_options={"synchronize_session": False},
+        )
+    session.flush()
 
-                if current_monthly_amount:
-                    required_amount = current_monthly_amount.amount
-                    start_date = last_payment_date.replace(day=1)
-                    end_date = (
-                        last_payment_date.replace(day=28) + timedelta(days=4)
-                    ).replace(day=1) - timedelta(days=1)
-
-                    deposited_amount = sum(
-                        tx.amount
-                        for tx in session.query(Transaction).filter(
-                            Transaction.fund_id == einzahlungsfonds.id,
-                            Transaction.group == group,
-                            Transaction.date.between(start_date, end_date),
-                        )
-                    )
-
-                    if deposited_amount < required_amount:
-                        if group.name not in missing_payments:
-                            missing_payments[group.name] = []
-                        missing_payments[group.name].append(
-                            (start_date, required_amount - deposited_amount)
-                        )
-                    else:
-                        group.last_full_payment_date = start_date + timedelta(days=30)
-                        session.commit()
-
-                last_payment_date = (
-                    last_payment_date.replace(day=28) + timedelta(days=4)
-                ).replace(day=1)
 
-        return missing_payments
+def rebuild_fund_snapshots(session=None) -> None:
+    """Regenerates the daily fund balance snapshots from confirmed transactions."""
+    if session is None:
+        with Session() as session:
+            rebuild_fund_snapshots(session)
+            session.commit()
+        return
+
+    day = func.date(Transaction.date)
+    daily = (
+        select(
+            Transaction.fund_id,
+            day.label("day"),
+            func.sum(Transaction.amount).label("amount"),
+        )
+        # Transactions of deleted funds are kept without a fund.
+        .where(Transaction.confirmed == True, Transaction.fund_id.isnot(None))
+        .group_by(Transaction.fund_id, day)
+        .subquery()
+    )
+    session.query(FundBalanceSnapshot).delete(synchronize_session=False)
+    session.execute(
+        insert(FundBalanceSnapshot).from_select(
+            ["fund_id", "date", "amount", "balance"],
+            select(
+                daily.c.fund_id,
+                daily.c.day,
+                daily.c.amount,
+                func.sum(daily.c.amount).over(
+                    partition_by=daily.c.fund_id, order_by=daily.c.day
+                ),
+            ),
+        )
+    )
+    session.merge(AppState(key=FUND_SNAPSHOTS_KEY, value=datetime.now().isoformat()))
+    session.flush()
+
+
+def ensure_fund_snapshots(session) -> None:
+    """Builds the snapshots once for databases that predate them."""
+    if session.get(AppState, FUND_SNAPSHOTS_KEY) is None:
+        rebuild_fund_snapshots(session)
+        session.commit()
+
+
+def fund_balances_at(session, day: Optional[date] = None) -> Dict[int, float]:
+    """Returns the confirmed balance of every fund at the end of ``day``.
+
+    Without a day the latest balances are returned.
+    """
+    latest = session.query(
+        FundBalanceSnapshot.fund_id,
+        func.max(FundBalanceSnapshot.date).label("date"),
+    )
+    if day is not None:
+        latest = latest.filter(FundBalanceSnapshot.date <= day)
+    latest = latest.group_by(FundBalanceSnapshot.fund_id).subquery()
+    return dict(
+        session.query(FundBalanceSnapshot.fund_id, FundBalanceSnapshot.balance).join(
+            latest,
+            (latest.c.fund_id == FundBalanceSnapshot.fund_id)
+            & (latest.c.date == FundBalanceSnapshot.date),
+        )
+    )
+
+
+# Balances are compared in cents, sums of floats may differ in the last digits.
+BALANCE_TOLERANCE = 0.005
+
+
+def reconcile_fund_balances(repair: bool = False) -> List[Tuple[str, float, float]]:
+    """Compares the stored fund balances with the sums of confirmed transactions.
+
+    All funds are checked with one aggregated query. Returns the funds whose
+    balance drifted as ``(fund_name, stored, computed)``. With ``repair`` the
+    stored balances are set to the computed ones.
+    """
+    with Session() as session:
+        # All transactions minus the pending ones: the totals are read from
+        # the covering index on (fund_id, ..., amount), the pending ones from
+        # the small partial index, so the table itself is never scanned.
+        totals = (
+            select(Transaction.fund_id, func.sum(Transaction.amount).label("total"))
+            .group_by(Transaction.fund_id)
+            .subquery()
+        )
+        pending = (
+            select(Transaction.fund_id, func.sum(Transaction.amount).label("total"))
+            .where(Transaction.confirmed == False)
+            .group_by(Transaction.fund_id)
+            .subquery()
+        )
+        rows = (
+            session.query(
+                Fund.id,
+                Fund.name,
+                func.coalesce(Fund.current_balance, 0),
+                func.coalesce(totals.c.total, 0) - func.coalesce(pending.c.total, 0),
+            )
+            .outerjoin(totals, totals.c.fund_id == Fund.id)
+            .outerjoin(pending, pending.c.fund_id == Fund.id)
+            .order_by(Fund.id)
+            .all()
+        )
+        drift = [
+            (fund_id, name, stored, computed)
+            for fund_id, name, stored, computed in rows
+            if abs(stored - computed) > BALANCE_TOLERANCE
+        ]
+
+        if repair and drift:
+            session.execute(
+                update(Fund),
+                [
+                    {"id": fund_id, "current_balance": computed}
+                    for fund_id, _, _, computed in drift
+                ],
+            )
+            session.commit()
+        return [(name, stored, computed) for _, name, stored, computed in drift]
+
+
+def add_transactions_bulk(session, specs: List[Dict]) -> None:
+    """Adds many transactions with one executemany in the caller's session.
+
+    Every spec holds ``fund_id``, ``amount``, ``date`` and ``group_id``, and
+    optionally ``comment``, ``confirmed``, ``transfer_id`` and
+    ``statement_line_hash``. The arrears of deposits into the Einzahlungsfonds
+    are refreshed; the caller commits.
+    """
+    if not specs:
+        return
+    rows = [
+        {
+            "fund_id": spec["fund_id"],
+            "amount": spec["amount"],
+            "date": spec["date"],
+            "group_id": spec["group_id"],
+            "comment": spec.get("comment"),
+            "confirmed": spec.get("confirmed", False),
+            "transfer_id": spec.get("transfer_id"),
+            "statement_line_hash": spec.get("statement_line_hash"),
+        }
+        for spec in specs
+    ]
+    session.execute(insert(Transaction), rows)
+
+    deposit_fund_id = _deposit_fund_id(session)
+    deposit_months: Dict[int, List[date]] = {}
+    for row in rows:
+        if row["fund_id"] == deposit_fund_id:
+            deposit_months.setdefault(row["group_id"], []).append(row["date"])
+    for group_id, dates in deposit_months.items():
+        refresh_arrears(session, group_id, min(dates), max(dates))
 
 
 def add_transaction(
@@ -195,44 +715,59 @@ def add_transaction(
 ) -> None:
     """Adds a transaction."""
     with Session() as session:
-        transaction = Transaction(
-            fund_id=fund_id,
-            amount=amount,
-            date=tx_date,
-            comment=comment,
-            group_id=group_id,
-            confirmed=confirmed,
-            transfer_id=transfer_id,
+        add_transactions_bulk(
+            session,
+            [
+                {
+                    "fund_id": fund_id,
+                    "amount": amount,
+                    "date": tx_date,
+                    "group_id": group_id,
+                    "comment": comment,
+                    "confirmed": confirmed,
+                    "transfer_id": transfer_id,
+                }
+            ],
         )
-        session.add(transaction)
         session.commit()
 
 
 def transfer_funds(
     from_fund_id: int, to_fund_id: int, amount: float, group_id: int
-) -> None:
-    """Transfers funds from one fund to another."""
+) -> int:
+    """Transfers funds from one fund to another.
+
+    Both legs are added in one commit under a new transfer id, which is
+    returned.
+    """
     with Session() as session:
-        transfer_id = (
-            session.query(Transaction).count() + 1
-        )  # Generate a unique transfer_id
-        add_transaction(
-            from_fund_id,
-            -amount,
-            datetime.now().date(),
-            group_id,
-            transfer_id=transfer_id,
-            comment=f"Transfer to {to_fund_id}",
-        )
-        add_transaction(
-            to_fund_id,
-            amount,
-            datetime.now().date(),
-            group_id,
-            transfer_id=transfer_id,
-            comment=f"Transfer from {from_fund_id}",
+        transfer = Transfer()
+        session.add(transfer)
+        session.flush()
+        today = datetime.now().date()
+        add_transactions_bulk(
+            session,
+            [
+                {
+                    "fund_id": from_fund_id,
+                    "amount": -amount,
+                    "date": today,
+                    "group_id": group_id,
+                    "comment": f"Transfer to {to_fund_id}",
+                    "transfer_id": transfer.id,
+                },
+                {
+                    "fund_id": to_fund_id,
+                    "amount": amount,
+                    "date": today,
+                    "group_id": group_id,
+                    "comment": f"Transfer from {from_fund_id}",
+                    "transfer_id": transfer.id,
+                },
+            ],
         )
         session.commit()
+        return transfer.id
 
 
 def delete_fund(fund_id: int, transfer_to_fund_id: int, group_id: int) -> None:
@@ -244,133 +779,228 @@ def delete_fund(fund_id: int, transfer_to_fund_id: int, group_id: int) -> None:
         )
         if fund_to_delete and transfer_to_fund:
             remaining_balance = fund_to_delete.current_balance
-            add_transaction(
-                transfer_to_fund_id,
-                remaining_balance,
-                datetime.now().date(),
-                group_id,
-                f"Transfer from {fund_to_delete.name}",
+            add_transactions_bulk(
+                session,
+                [
+                    {
+                        "fund_id": transfer_to_fund_id,
+                        "amount": remaining_balance,
+                        "date": datetime.now().date(),
+                        "group_id": group_id,
+                        "comment": f"Transfer from {fund_to_delete.name}",
+                    }
+                ],
             )
+            session.query(FundBalanceSnapshot).filter(
+                FundBalanceSnapshot.fund_id == fund_id
+            ).delete(synchronize_session=False)
             session.delete(fund_to_delete)
+            bump_data_version(session)
+            bump_data_version(session, ACCOUNTS_VERSION_KEY)
             session.commit()
 
 
-def calculate_rent_for_group(
-    group_id: int,
-) -> Dict[Literal["by_area", "by_head_count", "by_available_income"], float]:
-    with Session() as session:
-        # Step 1: Calculate the total yearly expenses
-        total_yearly_expenses = session.query(func.sum(Expense.yearly_amount)).scalar()
-
-        # Step 2: Calculate the total yearly target from all funds
-        total_yearly_target = session.query(func.sum(Fund.yearly_target)).scalar()
-
-        # Step 3: Calculate the monthly total rent
-        monthly_total_rent = (total_yearly_expenses + total_yearly_target) / 12
-
-        # Step 4: Calculate the proportion of rent each group should pay by different methods
-        # Calculate the total area of rooms and the total head count and income of all members
-        total_area = session.query(func.sum(Room.area)).scalar()
-        groups_active = session.query(Group).where(Group.active).all()
-        total_head_count = sum(group.head_count for group in groups_active)
-        all_incomes = [group.available_income for group in groups_active]
-        total_available_income = sum(all_incomes)
-
-        # Retrieve the group
-        group = session.query(Group).filter(Group.id == group_id).first()
-        # Calculate head count for the group
-        group_total_head_count: float = group.head_count
-
-        # ### rent by area ### #
-        all_rooms = session.query(Room).all()
-        room_area_rented_by_all = sum(
-            room.area for room in all_rooms if room.tenants == []
-        )
+house_totals_cache = VersionedCache("house_totals")
+
+
+def _load_house_totals(session) -> Dict[str, float]:
+    total_head_count = (
+        session.query(func.sum(PeopleCategory.head_count))
+        .join(Person, Person.category_id == PeopleCategory.id)
+        .join(Group, Group.id == Person.group_id)
+        .filter(Group.active)
+        .scalar()
+    )
+    return {
+        "total_yearly_expenses": session.query(
+            func.sum(Expense.yearly_amount)
+        ).scalar(),
+        "total_yearly_target": session.query(func.sum(Fund.yearly_target)).scalar(),
+        "total_area": session.query(func.sum(Room.area)).scalar(),
+        "total_head_count": total_head_count or 0,
+    }
+
 
-        # Distribute the rent for each room among its tenants proportionally to their head count
-        group_rent_by_area_count = (
-            (room_area_rented_by_all / total_area)  # portion of communal area
-            * monthly_total_rent
-            * (group_total_head_count / total_head_count)
-        )  # portion of heads
-        for room in group.rooms:
-            room_total_head_count = sum(tenant.head_count for tenant in room.tenants)
-            room_rent = (room.area / total_area) * monthly_total_rent
-            group_rent_by_area_count += (
-                group_total_head_count / room_total_head_count
-            ) * room_rent
-
-        # ### rent by head_count ### #
-        group_rent_by_head_count = (
-            group_total_head_count * monthly_total_rent / total_head_count
+def house_totals(session) -> Dict[str, float]:
+    """Returns the house-wide sums the rent is based on.
+
+    The sums are cached until the data version changes, see ``cache.py``.
+    """
+    return house_totals_cache.get(
+        get_data_version(session), lambda: _load_house_totals(session)
+    )
+
+
+RentCalculation = Dict[
+    Literal["by_area", "by_head_count", "by_available_income"], float
+]
+
+_group_loader_options = (
+    selectinload(Group.members).joinedload(Person.category),
+    selectinload(Group.rooms),
+)
+
+
+def _load_rent_basis(session) -> Dict:
+    """Loads the house-wide figures the rent calculation is based on.
+
+    Rooms, their tenants and all members with their categories are loaded
+    eagerly, so the number of queries does not depend on the number of groups.
+    """
+    totals = house_totals(session)
+    # Step 1: Calculate the monthly total rent from the total yearly expenses and fund targets
+    monthly_total_rent = (
+        totals["total_yearly_expenses"] + totals["total_yearly_target"]
+    ) / 12
+
+    # Step 2: Calculate the total area of rooms and the total head count and income of all members
+    total_area = totals["total_area"]
+    total_head_count = totals["total_head_count"]
+    all_rooms = (
+        session.query(Room)
+        .options(
+            selectinload(Room.tenants)
+            .selectinload(Group.members)
+            .joinedload(Person.category)
         )
-        # ### rent by available_income ### #
-        group_rent_by_available_income = (
-            group.available_income * monthly_total_rent / total_available_income
+        .all()
+    )
+    groups_active = (
+        session.query(Group).where(Group.active).options(*_group_loader_options).all()
+    )
+    head_counts = {group.id: group.head_count for group in groups_active}
+    total_available_income = sum(group.available_income for group in groups_active)
+
+    room_area_rented_by_all = sum(room.area for room in all_rooms if room.tenants == [])
+    room_head_counts = {}
+    for room in all_rooms:
+        room_total_head_count = 0
+        for tenant in room.tenants:
+            if tenant.id not in head_counts:
+                head_counts[tenant.id] = tenant.head_count
+            room_total_head_count += head_counts[tenant.id]
+        room_head_counts[room.id] = room_total_head_count
+
+    return {
+        "monthly_total_rent": monthly_total_rent,
+        "total_area": total_area,
+        "total_head_count": total_head_count,
+        "total_available_income": total_available_income,
+        "room_area_rented_by_all": room_area_rented_by_all,
+        "room_head_counts": room_head_counts,
+        "head_counts": head_counts,
+        "groups_active": groups_active,
+    }
+
+
+def _rent_for_group(group: Group, basis: Dict) -> RentCalculation:
+    """Calculates the proportion of rent a group should pay by different methods."""
+    monthly_total_rent = basis["monthly_total_rent"]
+    total_area = basis["total_area"]
+    total_head_count = basis["total_head_count"]
+    group_total_head_count: float = basis["head_counts"].get(group.id, group.head_count)
+
+    # ### rent by area ### #
+    # Distribute the rent for each room among its tenants proportionally to their head count
+    group_rent_by_area_count = (
+        (basis["room_area_rented_by_all"] / total_area)  # portion of communal area
+        * monthly_total_rent
+        * (group_total_head_count / total_head_count)
+    )  # portion of heads
+    for room in group.rooms:
+        room_total_head_count = basis["room_head_counts"][room.id]
+        room_rent = (room.area / total_area) * monthly_total_rent
+        group_rent_by_area_count += (
+            group_total_head_count / room_total_head_count
+        ) * room_rent
+
+    # ### rent by head_count ### #
+    group_rent_by_head_count = (
+        group_total_head_count * monthly_total_rent / total_head_count
+    )
+    # ### rent by available_income ### #
+    group_rent_by_available_income = (
+        group.available_income * monthly_total_rent / basis["total_available_income"]
+    )
+
+    return {
+        "by_area": group_rent_by_area_count,
+        "by_head_count": group_rent_by_head_count,
+        "by_available_income": group_rent_by_available_income,
+    }
+
+
+def calculate_rent_for_group(group_id: int) -> RentCalculation:
+    with Session() as session:
+        basis = _load_rent_basis(session)
+        group = (
+            session.query(Group)
+            .filter(Group.id == group_id)
+            .options(*_group_loader_options)
+            .first()
         )
+        return _rent_for_group(group, basis)
+
 
+def calculate_rent_for_all_groups() -> Dict[int, RentCalculation]:
+    """Calculates all rent variants for every active group in one pass.
+
+    Returns a mapping from group id to the result of ``calculate_rent_for_group``.
+    """
+    with Session() as session:
+        basis = _load_rent_basis(session)
         return {
-            "by_area": group_rent_by_area_count,
-            "by_head_count": group_rent_by_head_count,
-            "by_available_income": group_rent_by_available_income,
+            group.id: _rent_for_group(group, basis) for group in basis["groups_active"]
         }
 
 
 def bids_to_rent(bidding_status: BiddingStatus, session: Session) -> None:
+    """Replaces the payment schedules of the bidding groups for the period.
+
+    Each schedule table is cut off at the start of the period with one
+    UPDATE and the new cash and giro schedules are added with one insert
+    each; the arrears of all groups are refreshed together and everything is
+    committed at once.
+    """
     total_needed = bidding_status.total_amount_needed
     total_pledged = bidding_status.total_amount_pledged
+    period_start = bidding_status.period_start
 
     # Calculate proportion of each bid
     if total_pledged < total_needed:
         cash_needed = bidding_status.total_cash_needed - (total_needed - total_pledged)
     else:
         cash_needed = bidding_status.total_cash_needed
-    for bid in bidding_status.bids:
-        group = session.query(Group).filter(Group.id == bid.group_id).first()
-        proportion = bid.amount / total_pledged
+    bids = session.query(Bid.group_id, Bid.amount).filter(
+        Bid.bidding_status_id == bidding_status.id
+    )
+    cash_rows = []
+    giro_rows = []
+    for group_id, amount in bids:
+        proportion = amount / total_pledged
         cash_part = math.ceil(cash_needed * proportion / 5) * 5
         giro_part = (bidding_status.total_giro_needed * proportion) - cash_part
+        period = {
+            "group_id": group_id,
+            "start_date": period_start,
+            "end_date": bidding_status.period_end,
+        }
+        cash_rows.append({**period, "amount": cash_part})
+        giro_rows.append({**period, "amount": giro_part})
+    if not cash_rows:
+        session.commit()
+        return
 
-        # Adjust existing MonthlyCash records
-        existing_cash_records = (
-            session.query(MonthlyCash)
-            .filter(
-                MonthlyCash.group_id == group.id,
-                MonthlyCash.end_date >= bidding_status.period_start,
-            )
-            .all()
-        )
-        for record in existing_cash_records:
-            record.end_date = bidding_status.period_start
-
-        # Adjust existing MonthlyGiro records
-        existing_giro_records = (
-            session.query(MonthlyGiro)
-            .filter(
-                MonthlyGiro.group_id == group.id,
-                MonthlyGiro.end_date >= bidding_status.period_start,
-            )
-            .all()
-        )
-        for record in existing_giro_records:
-            record.end_date = bidding_status.period_start
-
-        # add new records
-        new_cash_transfer = MonthlyCash(
-            group_id=group.id,
-            amount=cash_part,
-            start_date=bidding_status.period_start,
-            end_date=bidding_status.period_end,
-        )
-        session.add(new_cash_transfer)
-
-        new_giro_transfer = MonthlyGiro(
-            group_id=group.id,
-            amount=giro_part,
-            start_date=bidding_status.period_start,
-            end_date=bidding_status.period_end,
+    group_ids = [row["group_id"] for row in cash_rows]
+    for model, rows in ((MonthlyCash, cash_rows), (MonthlyGiro, giro_rows)):
+        session.execute(
+            update(model)
+            .where(model.group_id.in_(group_ids), model.end_date >= period_start)
+            .values(end_date=period_start),
+            execution_options={"synchronize_session": False},
         )
-        session.add(new_giro_transfer)
+        session.execute(insert(model), rows)
+    refresh_arrears(session, group_ids, period_start)
     session.commit()
 
 
@@ -386,26 +1016,10 @@ def current_payments(group, session):
     Tuple containing the current monthly cash payment (float) and the current monthly giro payment amount (float).
     """
 
-    current_cash_payment = (
-        session.query(MonthlyCash)
-        .filter(
-            MonthlyCash.group_id == group.id,
-            MonthlyCash.start_date < datetime.now(),
-            MonthlyCash.end_date > datetime.now(),
-        )
-        .first()
-    )
-    current_giro_payment = (
-        session.query(MonthlyGiro)
-        .filter(
-            MonthlyGiro.group_id == group.id,
-            MonthlyGiro.start_date < datetime.now(),
-            MonthlyGiro.end_date > datetime.now(),
-        )
-        .first()
-    )
-    cash = current_cash_payment.amount if current_cash_payment else 0
-    giro = current_giro_payment.amount if current_giro_payment else 0
+    month = datetime.now().date().replace(day=1)
+    schedule = resolve_schedules(session, month, month, [group.id])
+    cash = schedule.due(group.id, month, "cash") or 0
+    giro = schedule.due(group.id, month, "giro") or 0
 
     return cash, giro
 
@@ -430,4 +1044,7 @@ def log_change(
             new_amount=new_amount,
         )
     session.add(change_log)
+    bump_data_version(session)
+    if entity_type == "fund":
+        bump_data_version(session, ACCOUNTS_VERSION_KEY)
     session.commit()
@@ -0,0 +1,121 @@
+"""Query and render timings per Streamlit tab.
+
+``install`` hooks into the cursor events of an engine. While a tab runs
+inside ``profile_tab``, every statement executed by the script thread is
+counted and timed. The time not spent in SQL is what pandas, Plotly and
+Streamlit took to build the page. Each profile is written as one JSON log
+line if ``HAUSVERWALTUNG_PROFILE_LOG`` is set.
+"""
+
+import heapq
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+SLOWEST_STATEMENTS = 5
+
+logger = logging.getLogger(__name__)
+if config.PROFILE_LOG and not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_current = threading.local()
+
+
+class TabProfile:
+    """Query count, SQL time, slowest statements and total time of one tab."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.query_count = 0
+        self.sql_seconds = 0.0
+        self.total_seconds = 0.0
+        self._slowest: List[Tuple[float, int, str]] = []
+
+    def add_query(self, statement: str, seconds: float) -> None:
+        self.query_count += 1
+        self.sql_seconds += seconds
+        entry = (seconds, self.query_count, statement)
+        if len(self._slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    @property
+    def render_seconds(self) -> float:
+        return max(self.total_seconds - self.sql_seconds, 0.0)
+
+    @property
+    def slowest(self) -> List[Tuple[float, str]]:
+        return [
+            (seconds, " ".join(statement.split()))
+            for seconds, _, statement in sorted(self._slowest, reverse=True)
+        ]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tab": self.name,
+            "queries": self.query_count,
+            "sql_ms": round(self.sql_seconds * 1000, 2),
+            "render_ms": round(self.render_seconds * 1000, 2),
+            "total_ms": round(self.total_seconds * 1000, 2),
+            "slowest": [
+                {"ms": round(seconds * 1000, 2), "statement": statement}
+                for seconds, statement in self.slowest
+            ],
+        }
+
+
+# The start time is kept on the execution context, so a statement that
+# raises leaves nothing behind for the next statement on the connection.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = getattr(_current, "profile", None)
+    if profile is not None:
+        profile.add_query(statement, time.perf_counter() - context.query_started)
+
+
+def install(engine: Engine) -> None:
+    """Starts timing the statements of an engine; safe to call on every rerun."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+@contextmanager
+def profile_tab(name: str, user: Optional[str] = None) -> Iterator[TabProfile]:
+    """Records the statements and the total time of the enclosed block."""
+    profile = TabProfile(name)
+    previous = getattr(_current, "profile", None)
+    _current.profile = profile
+    started = time.perf_counter()
+    try:
+        yield profile
+    finally:
+        profile.total_seconds = time.perf_counter() - started
+        _current.profile = previous
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                json.dumps(
+                    {
+                        "event": "tab_profile",
+                        "time": datetime.now().isoformat(timespec="milliseconds"),
+                        "user": user,
+                        **profile.to_dict(),
+                    }
+                )
+            )
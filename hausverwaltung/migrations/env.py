@@ -0,0 +1,39 @@
+"""Alembic environment.
+
+``bootstrap.init_db`` passes its own connection in ``config.attributes``;
+the ``alembic`` command line connects with the engine from ``database.py``.
+"""
+
+from logging.config import fileConfig
+
+from alembic import context
+
+from database import create_db_engine
+from models import Base
+
+config = context.config
+target_metadata = Base.metadata
+
+connection = config.attributes.get("connection")
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+
+def run_migrations(connection) -> None:
+    # SQLite cannot alter tables in place, batch mode recreates them.
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    raise SystemExit("Offline migrations are not supported.")
+elif connection is not None:
+    run_migrations(connection)
+else:
+    with create_db_engine().connect() as connection:
+        run_migrations(connection)
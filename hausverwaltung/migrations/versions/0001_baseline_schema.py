@@ -0,0 +1,322 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 03:59:24.414574
+
+Databases created before migrations were introduced already have some or
+all of these tables, created by ``Base.metadata.create_all``. Only missing
+tables are created, so this revision adopts such databases as they are.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    if "app_state" not in existing:
+        op.create_table(
+            "app_state",
+            sa.Column("key", sa.String(), nullable=False),
+            sa.Column("value", sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint("key"),
+        )
+    if "bidding_status" not in existing:
+        op.create_table(
+            "bidding_status",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("status", sa.String(), nullable=True),
+            sa.Column("total_giro_needed", sa.Float(), nullable=True),
+            sa.Column("total_cash_needed", sa.Float(), nullable=True),
+            sa.Column("total_amount_pledged", sa.Float(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.Column("period_start", sa.Date(), nullable=True),
+            sa.Column("period_end", sa.Date(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_bidding_status_id", "bidding_status", ["id"], unique=False)
+    if "expenses" not in existing:
+        op.create_table(
+            "expenses",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("yearly_amount", sa.Float(), nullable=True),
+            sa.Column(
+                "type", sa.Enum("ancillary", "rent", name="rent_type"), nullable=False
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_expenses_id", "expenses", ["id"], unique=False)
+        op.create_index("ix_expenses_name", "expenses", ["name"], unique=False)
+    if "funds" not in existing:
+        op.create_table(
+            "funds",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("current_balance", sa.Float(), nullable=True),
+            sa.Column("yearly_target", sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_funds_id", "funds", ["id"], unique=False)
+        op.create_index("ix_funds_name", "funds", ["name"], unique=False)
+    if "groups" not in existing:
+        op.create_table(
+            "groups",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("last_full_payment_date", sa.Date(), nullable=True),
+            sa.Column("password", sa.String(), nullable=False),
+            sa.Column("role", sa.String(), nullable=False),
+            sa.Column("active", sa.Boolean(), nullable=True),
+            sa.Column("income", sa.Integer(), nullable=True),
+            sa.Column("last_updated", sa.Date(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_groups_id", "groups", ["id"], unique=False)
+        op.create_index("ix_groups_name", "groups", ["name"], unique=False)
+    if "people_categories" not in existing:
+        op.create_table(
+            "people_categories",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("monthly_base_need", sa.Integer(), nullable=True),
+            sa.Column("head_count", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_people_categories_name", "people_categories", ["name"], unique=False
+        )
+    if "rooms" not in existing:
+        op.create_table(
+            "rooms",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("name", sa.String(), nullable=True),
+            sa.Column("area", sa.Float(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    if "arrears_ledger" not in existing:
+        op.create_table(
+            "arrears_ledger",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("group_id", sa.Integer(), nullable=False),
+            sa.Column("month", sa.Date(), nullable=False),
+            sa.Column("amount_due", sa.Float(), nullable=False),
+            sa.Column("amount_deposited", sa.Float(), nullable=False),
+            sa.Column("shortfall", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint(
+                "group_id", "month", name="uq_arrears_ledger_group_month"
+            ),
+        )
+        op.create_index(
+            "ix_arrears_ledger_open",
+            "arrears_ledger",
+            ["group_id", "month"],
+            unique=False,
+            sqlite_where=sa.text("shortfall > 0"),
+        )
+    if "bids" not in existing:
+        op.create_table(
+            "bids",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.Column("bidding_status_id", sa.Integer(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("submitted_at", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["bidding_status_id"],
+                ["bidding_status.id"],
+            ),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_bids_id", "bids", ["id"], unique=False)
+    if "expense_change_logs" not in existing:
+        op.create_table(
+            "expense_change_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("expense_id", sa.Integer(), nullable=False),
+            sa.Column(
+                "change_type",
+                sa.Enum("add", "edit", "delete", name="change_type"),
+                nullable=False,
+            ),
+            sa.Column("timestamp", sa.DateTime(), nullable=True),
+            sa.Column("details", sa.String(), nullable=False),
+            sa.Column("previous_amount", sa.Float(), nullable=True),
+            sa.Column("new_amount", sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["expense_id"],
+                ["expenses.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_expense_change_logs_id", "expense_change_logs", ["id"], unique=False
+        )
+    if "fund_balance_snapshots" not in existing:
+        op.create_table(
+            "fund_balance_snapshots",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("fund_id", sa.Integer(), nullable=False),
+            sa.Column("date", sa.Date(), nullable=False),
+            sa.Column("amount", sa.Float(), nullable=False),
+            sa.Column("balance", sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(
+                ["fund_id"],
+                ["funds.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("fund_id", "date", name="uq_fund_balance_snapshot_day"),
+        )
+        op.create_index(
+            "ix_fund_balance_snapshots_date",
+            "fund_balance_snapshots",
+            ["date"],
+            unique=False,
+        )
+    if "fund_change_logs" not in existing:
+        op.create_table(
+            "fund_change_logs",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("fund_id", sa.Integer(), nullable=True),
+            sa.Column("change_type", sa.String(), nullable=False),
+            sa.Column("details", sa.String(), nullable=True),
+            sa.Column("previous_amount", sa.Float(), nullable=True),
+            sa.Column("new_amount", sa.Float(), nullable=True),
+            sa.Column("timestamp", sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["fund_id"],
+                ["funds.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_fund_change_logs_id", "fund_change_logs", ["id"], unique=False
+        )
+    if "monthly_cash_amounts" not in existing:
+        op.create_table(
+            "monthly_cash_amounts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("start_date", sa.Date(), nullable=True),
+            sa.Column("end_date", sa.Date(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_monthly_cash_amounts_id", "monthly_cash_amounts", ["id"], unique=False
+        )
+    if "monthly_giro_amounts" not in existing:
+        op.create_table(
+            "monthly_giro_amounts",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("start_date", sa.Date(), nullable=True),
+            sa.Column("end_date", sa.Date(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_monthly_giro_amounts_id", "monthly_giro_amounts", ["id"], unique=False
+        )
+    if "persons" not in existing:
+        op.create_table(
+            "persons",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("category_id", sa.Integer(), nullable=True),
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["category_id"],
+                ["people_categories.id"],
+            ),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    if "room_tenants" not in existing:
+        op.create_table(
+            "room_tenants",
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.Column("room_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.ForeignKeyConstraint(
+                ["room_id"],
+                ["rooms.id"],
+            ),
+        )
+    if "transactions" not in existing:
+        op.create_table(
+            "transactions",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("fund_id", sa.Integer(), nullable=True),
+            sa.Column("amount", sa.Float(), nullable=True),
+            sa.Column("date", sa.Date(), nullable=True),
+            sa.Column("comment", sa.String(), nullable=True),
+            sa.Column("confirmed", sa.Boolean(), nullable=True),
+            sa.Column("group_id", sa.Integer(), nullable=True),
+            sa.Column("transfer_id", sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(
+                ["fund_id"],
+                ["funds.id"],
+            ),
+            sa.ForeignKeyConstraint(
+                ["group_id"],
+                ["groups.id"],
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_transactions_id", "transactions", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("transactions")
+    op.drop_table("room_tenants")
+    op.drop_table("persons")
+    op.drop_table("monthly_giro_amounts")
+    op.drop_table("monthly_cash_amounts")
+    op.drop_table("fund_change_logs")
+    op.drop_table("fund_balance_snapshots")
+    op.drop_table("expense_change_logs")
+    op.drop_table("bids")
+    op.drop_table("arrears_ledger")
+    op.drop_table("rooms")
+    op.drop_table("people_categories")
+    op.drop_table("groups")
+    op.drop_table("funds")
+    op.drop_table("expenses")
+    op.drop_table("bidding_status")
+    op.drop_table("app_state")
@@ -0,0 +1,92 @@
+"""indexes for the hot query shapes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 04:00:23.209416
+
+Composite indexes for the filters used by functions.py and queries.py, and
+indexes on the foreign keys of the change logs. The
+schedule and transaction indexes include the amount, so the lookups and sums
+are answered from the index alone.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "ix_transactions_fund_group_date",
+        "transactions",
+        ["fund_id", "group_id", "date", "amount"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_transactions_unconfirmed",
+        "transactions",
+        ["confirmed"],
+        unique=False,
+        sqlite_where=sa.text("confirmed = 0"),
+    )
+    op.create_index(
+        "ix_transactions_transfer_id",
+        "transactions",
+        ["transfer_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_monthly_cash_group_period",
+        "monthly_cash_amounts",
+        ["group_id", "start_date", "end_date", "amount"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_monthly_giro_group_period",
+        "monthly_giro_amounts",
+        ["group_id", "start_date", "end_date", "amount"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_bids_status_group",
+        "bids",
+        ["bidding_status_id", "group_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_fund_change_logs_fund_id", "fund_change_logs", ["fund_id"], unique=False
+    )
+    op.create_index(
+        "ix_expense_change_logs_expense_id",
+        "expense_change_logs",
+        ["expense_id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_bidding_status_status_created",
+        "bidding_status",
+        ["status", "created_at"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_bidding_status_status_created", table_name="bidding_status")
+    op.drop_index("ix_expense_change_logs_expense_id", table_name="expense_change_logs")
+    op.drop_index("ix_fund_change_logs_fund_id", table_name="fund_change_logs")
+    op.drop_index("ix_bids_status_group", table_name="bids")
+    op.drop_index("ix_monthly_giro_group_period", table_name="monthly_giro_amounts")
+    op.drop_index("ix_monthly_cash_group_period", table_name="monthly_cash_amounts")
+    op.drop_index("ix_transactions_transfer_id", table_name="transactions")
+    op.drop_index("ix_transactions_unconfirmed", table_name="transactions")
+    op.drop_index("ix_transactions_fund_group_date", table_name="transactions")
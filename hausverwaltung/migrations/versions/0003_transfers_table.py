@@ -0,0 +1,49 @@
+"""transfers table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 04:03:03.946312
+
+Transfers get their own table, so transfer ids are allocated by SQLite
+rather than by counting transactions. The ids already used by transactions
+are taken over as they are.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "transfers",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sqlite_autoincrement=True,
+    )
+    op.execute(
+        "INSERT INTO transfers (id, created_at) "
+        "SELECT transfer_id, MIN(date) || ' 00:00:00.000000' FROM transactions "
+        "WHERE transfer_id IS NOT NULL GROUP BY transfer_id"
+    )
+    with op.batch_alter_table("transactions", schema=None) as batch_op:
+        batch_op.create_foreign_key(
+            "fk_transactions_transfer_id", "transfers", ["transfer_id"], ["id"]
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("transactions", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_transactions_transfer_id", type_="foreignkey")
+    op.drop_table("transfers")
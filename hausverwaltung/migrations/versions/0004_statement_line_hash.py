@@ -0,0 +1,39 @@
+"""statement line hash
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 04:17:06.838419
+
+Imported bank statement lines carry a hash of the line, the unique index
+makes re-imports of the same statement idempotent.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("transactions", schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column("statement_line_hash", sa.String(), nullable=True)
+        )
+        batch_op.create_index(
+            "ux_transactions_statement_line_hash", ["statement_line_hash"], unique=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("transactions", schema=None) as batch_op:
+        batch_op.drop_index("ux_transactions_statement_line_hash")
+        batch_op.drop_column("statement_line_hash")
@@ -0,0 +1,56 @@
+"""transaction browser indexes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 04:41:12.513208
+
+The transaction browser lists transactions newest first, optionally for
+one fund or group or only the pending ones. Each filter gets an index in
+date order, so a page is read without sorting the whole ledger.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index("ix_transactions_date", "transactions", ["date"], unique=False)
+    op.create_index(
+        "ix_transactions_fund_date", "transactions", ["fund_id", "date"], unique=False
+    )
+    op.create_index(
+        "ix_transactions_group_date", "transactions", ["group_id", "date"], unique=False
+    )
+    op.drop_index("ix_transactions_unconfirmed", table_name="transactions")
+    op.create_index(
+        "ix_transactions_unconfirmed",
+        "transactions",
+        ["confirmed", "date"],
+        unique=False,
+        sqlite_where=sa.text("confirmed = 0"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_transactions_unconfirmed", table_name="transactions")
+    op.create_index(
+        "ix_transactions_unconfirmed",
+        "transactions",
+        ["confirmed"],
+        unique=False,
+        sqlite_where=sa.text("confirmed = 0"),
+    )
+    op.drop_index("ix_transactions_group_date", table_name="transactions")
+    op.drop_index("ix_transactions_fund_date", table_name="transactions")
+    op.drop_index("ix_transactions_date", table_name="transactions")
@@ -8,15 +8,18 @@ from sqlalchemy import (
     Date,
     ForeignKey,
     Boolean,
-    create_engine,
     Table,
     Enum,
     DateTime,
+    Index,
+    UniqueConstraint,
 )
 from sqlalchemy.orm import relationship, sessionmaker, declarative_base
 
+from database import create_db_engine
+
 Base = declarative_base()
-engine = create_engine("sqlite:///cash_management.db")
+engine = create_db_engine()
 Session = sessionmaker(bind=engine)
 
 
@@ -60,6 +63,10 @@ class BiddingStatus(Base):
     period_start = Column(Date)
     period_end = Column(Date)
 
+    __table_args__ = (
+        Index("ix_bidding_status_status_created", "status", "created_at"),
+    )
+
     @property
     def total_amount_needed(self) -> float:
         return self.total_cash_needed + self.total_giro_needed
@@ -79,6 +86,8 @@ class Bid(Base):
     amount = Column(Float)
     submitted_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index("ix_bids_status_group", "bidding_status_id", "group_id"),)
+
 
 class Person(Base):
     __tablename__ = "persons"
@@ -121,6 +130,17 @@ class MonthlyCash(Base):
     start_date = Column(Date)
     end_date = Column(Date)
 
+    # Includes the amount, so schedule lookups never read the table.
+    __table_args__ = (
+        Index(
+            "ix_monthly_cash_group_period",
+            "group_id",
+            "start_date",
+            "end_date",
+            "amount",
+        ),
+    )
+
 
 class MonthlyGiro(Base):
     __tablename__ = "monthly_giro_amounts"
@@ -130,6 +150,47 @@ class MonthlyGiro(Base):
     start_date = Column(Date)
     end_date = Column(Date)
 
+    # Includes the amount, so schedule lookups never read the table.
+    __table_args__ = (
+        Index(
+            "ix_monthly_giro_group_period",
+            "group_id",
+            "start_date",
+            "end_date",
+            "amount",
+        ),
+    )
+
+
+class ArrearsLedger(Base):
+    """Due and deposited cash amount of a group for one month."""
+
+    __tablename__ = "arrears_ledger"
+    id = Column(Integer, primary_key=True)
+    group_id = Column(Integer, ForeignKey("groups.id"), nullable=False)
+    month = Column(Date, nullable=False)  # first day of the month
+    amount_due = Column(Float, nullable=False)
+    amount_deposited = Column(Float, nullable=False, default=0.0)
+    shortfall = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        UniqueConstraint("group_id", "month", name="uq_arrears_ledger_group_month"),
+        Index(
+            "ix_arrears_ledger_open",
+            "group_id",
+            "month",
+            sqlite_where=shortfall > 0,
+        ),
+    )
+
+
+class AppState(Base):
+    """Key/value store for bookkeeping values such as high-water marks."""
+
+    __tablename__ = "app_state"
+    key = Column(String, primary_key=True)
+    value = Column(String)
+
 
 class Fund(Base):
     __tablename__ = "funds"
@@ -141,10 +202,26 @@ class Fund(Base):
     change_logs = relationship("FundChangeLog", back_populates="fund")
 
 
+class FundBalanceSnapshot(Base):
+    """Balance of a fund at the end of a day with confirmed transactions."""
+
+    __tablename__ = "fund_balance_snapshots"
+    id = Column(Integer, primary_key=True)
+    fund_id = Column(Integer, ForeignKey("funds.id"), nullable=False)
+    date = Column(Date, nullable=False)
+    amount = Column(Float, nullable=False)  # net amount confirmed for this day
+    balance = Column(Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("fund_id", "date", name="uq_fund_balance_snapshot_day"),
+        Index("ix_fund_balance_snapshots_date", "date"),
+    )
+
+
 class FundChangeLog(Base):
     __tablename__ = "fund_change_logs"
     id = Column(Integer, primary_key=True, index=True)
-    fund_id = Column(Integer, ForeignKey("funds.id"))
+    fund_id = Column(Integer, ForeignKey("funds.id"), index=True)
     change_type = Column(String, nullable=False)  # e.g., 'add', 'edit', 'delete'
     details = Column(String)
     previous_amount = Column(Float)
@@ -166,7 +243,7 @@ class Expense(Base):
 class ExpenseChangeLog(Base):
     __tablename__ = "expense_change_logs"
     id = Column(Integer, primary_key=True, index=True)
-    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False)
+    expense_id = Column(Integer, ForeignKey("expenses.id"), nullable=False, index=True)
     change_type = Column(
         Enum("add", "edit", "delete", name="change_type"), nullable=False
     )
@@ -177,6 +254,20 @@ class ExpenseChangeLog(Base):
     expense = relationship("Expense", back_populates="change_logs")
 
 
+class Transfer(Base):
+    """Groups the legs of a transfer between funds.
+
+    AUTOINCREMENT keeps SQLite from reusing the ids of deleted transfers.
+    """
+
+    __tablename__ = "transfers"
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    transactions = relationship("Transaction", back_populates="transfer")
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
 class Transaction(Base):
     __tablename__ = "transactions"
     id = Column(Integer, primary_key=True, index=True)
@@ -188,7 +279,30 @@ class Transaction(Base):
     confirmed = Column(Boolean, default=False)
     group_id = Column(Integer, ForeignKey("groups.id"))
     group = relationship("Group", back_populates="transactions")
-    transfer_id = Column(Integer, nullable=True)
-
-
-Base.metadata.create_all(bind=engine)
+    transfer_id = Column(Integer, ForeignKey("transfers.id"), nullable=True)
+    transfer = relationship("Transfer", back_populates="transactions")
+    # Set on imported bank statement lines, re-imports skip known hashes.
+    statement_line_hash = Column(String, nullable=True)
+
+    __table_args__ = (
+        # Covers the sums per fund, group and month, e.g. the deposits.
+        Index(
+            "ix_transactions_fund_group_date", "fund_id", "group_id", "date", "amount"
+        ),
+        # Only the few pending transactions are indexed, in date order.
+        Index(
+            "ix_transactions_unconfirmed",
+            "confirmed",
+            "date",
+            sqlite_where=confirmed == False,
+        ),
+        Index("ix_transactions_transfer_id", "transfer_id"),
+        # Newest first per filter; SQLite appends the id to every index, so
+        # these serve the (date, id) order of the transaction browser.
+        Index("ix_transactions_date", "date"),
+        Index("ix_transactions_fund_date", "fund_id", "date"),
+        Index("ix_transactions_group_date", "group_id", "date"),
+        Index(
+            "ux_transactions_statement_line_hash", "statement_line_hash", unique=True
+        ),
+    )
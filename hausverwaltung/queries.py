@@ -0,0 +1,309 @@
+"""Named read queries used by the views.
+
+Every function states how related rows are loaded, either with explicit
+loader options or by returning flat row tuples. A view built from these
+functions runs a fixed number of queries no matter how many rows it shows.
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import selectinload
+
+from models import (
+    Bid,
+    BiddingStatus,
+    Expense,
+    ExpenseChangeLog,
+    Fund,
+    FundBalanceSnapshot,
+    FundChangeLog,
+    Group,
+    PeopleCategory,
+    Person,
+    Room,
+    Transaction,
+)
+
+_group_details = (
+    selectinload(Group.members).joinedload(Person.category),
+    selectinload(Group.rooms),
+)
+
+
+# Groups
+
+
+def all_groups(session) -> List[Group]:
+    return session.query(Group).order_by(Group.id).all()
+
+
+def active_groups(session, with_details: bool = False) -> List[Group]:
+    """Returns the active groups, with members, categories and rooms if requested."""
+    query = session.query(Group).filter(Group.active == True).order_by(Group.id)
+    if with_details:
+        query = query.options(*_group_details)
+    return query.all()
+
+
+def active_group_count(session) -> int:
+    return session.query(func.count(Group.id)).filter(Group.active == True).scalar()
+
+
+def group_by_name(session, name: str) -> Optional[Group]:
+    """Returns a group with its members, their categories and its rooms."""
+    return (
+        session.query(Group).filter(Group.name == name).options(*_group_details).first()
+    )
+
+
+def groups_by_ids(session, group_ids: List[int]) -> List[Group]:
+    return session.query(Group).filter(Group.id.in_(group_ids)).all()
+
+
+def active_groups_not_updated_since(session, since: datetime) -> int:
+    return (
+        session.query(func.count(Group.id))
+        .filter(Group.active, Group.last_updated < since)
+        .scalar()
+    )
+
+
+def active_groups_without_income(session) -> int:
+    return (
+        session.query(func.count(Group.id))
+        .filter(Group.active, Group.income == None)
+        .scalar()
+    )
+
+
+# Rooms and people categories
+
+
+def rooms_with_tenants(session) -> List[Room]:
+    return session.query(Room).options(selectinload(Room.tenants)).all()
+
+
+def rooms_by_ids(session, room_ids: List[int]) -> List[Room]:
+    return session.query(Room).filter(Room.id.in_(room_ids)).all()
+
+
+def all_categories(session) -> List[PeopleCategory]:
+    return session.query(PeopleCategory).all()
+
+
+# Funds and expenses
+
+
+def all_funds(session) -> List[Fund]:
+    return session.query(Fund).order_by(Fund.id).all()
+
+
+def fund_by_name(session, name: str) -> Optional[Fund]:
+    return session.query(Fund).filter(Fund.name == name).first()
+
+
+def fund_names(session) -> Dict[int, str]:
+    return dict(session.query(Fund.id, Fund.name))
+
+
+def fund_snapshots_between(session, start: date, end: date) -> List:
+    """Returns ``(fund_id, date, amount, balance)`` rows of the snapshots in a window."""
+    return (
+        session.query(
+            FundBalanceSnapshot.fund_id,
+            FundBalanceSnapshot.date,
+            FundBalanceSnapshot.amount,
+            FundBalanceSnapshot.balance,
+        )
+        .filter(FundBalanceSnapshot.date.between(start, end))
+        .all()
+    )
+
+
+def all_expenses(session) -> List[Expense]:
+    return session.query(Expense).order_by(Expense.id).all()
+
+
+def change_log_rows(
+    session,
+    after: Tuple[int, int] = (0, 0),
+    through: Optional[Tuple[int, int]] = None,
+) -> List:
+    """Returns ``(date, name, amount, details)`` rows of expense and fund changes.
+
+    ``after`` and ``through`` limit the rows to a range of expense and fund
+    change log ids. Changes of deleted funds are left out.
+    """
+    expense_rows = session.query(
+        ExpenseChangeLog.timestamp,
+        Expense.name,
+        ExpenseChangeLog.new_amount,
+        ExpenseChangeLog.previous_amount,
+        ExpenseChangeLog.details,
+    ).join(Expense, Expense.id == ExpenseChangeLog.expense_id, isouter=True)
+    fund_rows = session.query(
+        FundChangeLog.timestamp,
+        Fund.name,
+        FundChangeLog.new_amount,
+        FundChangeLog.previous_amount,
+        FundChangeLog.details,
+    ).join(Fund, Fund.id == FundChangeLog.fund_id)
+    expense_rows = expense_rows.filter(ExpenseChangeLog.id > after[0])
+    fund_rows = fund_rows.filter(FundChangeLog.id > after[1])
+    if through is not None:
+        expense_rows = expense_rows.filter(ExpenseChangeLog.id <= through[0])
+        fund_rows = fund_rows.filter(FundChangeLog.id <= through[1])
+    return [
+        (timestamp, name, (new_amount or 0) - (previous_amount or 0), details)
+        for timestamp, name, new_amount, previous_amount, details in expense_rows.all()
+        + fund_rows.all()
+    ]
+
+
+def change_log_marks(session) -> Tuple[int, int]:
+    """Returns the highest expense and fund change log ids."""
+    return (
+        session.query(func.max(ExpenseChangeLog.id)).scalar() or 0,
+        session.query(func.max(FundChangeLog.id)).scalar() or 0,
+    )
+
+
+def expense_names(session) -> Dict[int, str]:
+    return dict(session.query(Expense.id, Expense.name))
+
+
+# Transactions and payment schedules
+
+
+def pending_transactions(session) -> List:
+    """Returns the unconfirmed transactions as flat rows with fund and group names."""
+    return (
+        session.query(
+            Transaction.id,
+            Transaction.transfer_id,
+            Fund.name.label("fund_name"),
+            Group.name.label("group_name"),
+            Transaction.comment,
+            Transaction.amount,
+        )
+        .join(Fund, Fund.id == Transaction.fund_id)
+        .join(Group, Group.id == Transaction.group_id)
+        .filter(Transaction.confirmed == False)
+        .order_by(Transaction.id)
+        .all()
+    )
+
+
+def transactions_page(
+    session,
+    limit: int,
+    before: Optional[Tuple[date, int]] = None,
+    fund_id: Optional[int] = None,
+    group_id: Optional[int] = None,
+    confirmed: Optional[bool] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+) -> List:
+    """Returns up to ``limit`` transactions, newest first, as flat rows.
+
+    Pages are cut by the ``(date, id)`` of the last row of the previous
+    page instead of an offset, so every page reads only its own rows from
+    the date indexes, however long the ledger is.
+    """
+    query = (
+        session.query(
+            Transaction.id,
+            Transaction.date,
+            Fund.name.label("fund_name"),
+            Group.name.label("group_name"),
+            Transaction.amount,
+            Transaction.comment,
+            Transaction.confirmed,
+        )
+        .outerjoin(Fund, Fund.id == Transaction.fund_id)
+        .outerjoin(Group, Group.id == Transaction.group_id)
+    )
+    if before is not None:
+        query = query.filter(tuple_(Transaction.date, Transaction.id) < before)
+    if fund_id is not None:
+        query = query.filter(Transaction.fund_id == fund_id)
+    if group_id is not None:
+        query = query.filter(Transaction.group_id == group_id)
+    if confirmed is not None:
+        query = query.filter(Transaction.confirmed == confirmed)
+    if start is not None:
+        query = query.filter(Transaction.date >= start)
+    if end is not None:
+        query = query.filter(Transaction.date <= end)
+    return (
+        query.order_by(Transaction.date.desc(), Transaction.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def schedule_rows(
+    session,
+    model,
+    first_day: date,
+    last_day: date,
+    group_ids: Optional[List[int]] = None,
+) -> List:
+    """Returns ``(id, group_id, amount, start_date, end_date)`` of the schedules
+    of ``model`` running at some point between the two days."""
+    query = session.query(
+        model.id, model.group_id, model.amount, model.start_date, model.end_date
+    ).filter(model.start_date <= last_day, model.end_date >= first_day)
+    if group_ids is not None:
+        query = query.filter(model.group_id.in_(group_ids))
+    # In index order, so the covering index on the periods is read.
+    return query.order_by(model.group_id, model.start_date).all()
+
+
+# Bidding
+
+
+def latest_bidding_status(session, status: str) -> Optional[BiddingStatus]:
+    return (
+        session.query(BiddingStatus)
+        .filter(BiddingStatus.status == status)
+        .order_by(BiddingStatus.created_at.desc())
+        .first()
+    )
+
+
+def open_bidding_status(session) -> Optional[BiddingStatus]:
+    """Returns the open bidding round with its bids loaded."""
+    return (
+        session.query(BiddingStatus)
+        .filter(BiddingStatus.status == "open")
+        .options(selectinload(BiddingStatus.bids))
+        .first()
+    )
+
+
+def last_declined_bidding_status(
+    session, period_start: date, period_end: date
+) -> Optional[BiddingStatus]:
+    return (
+        session.query(BiddingStatus)
+        .filter(BiddingStatus.status == "declined")
+        .filter(BiddingStatus.period_end == period_end)
+        .filter(BiddingStatus.period_start == period_start)
+        .order_by(BiddingStatus.created_at.desc())
+        .first()
+    )
+
+
+def bids_for_round(session, bidding_status_id: int) -> List[Bid]:
+    return session.query(Bid).filter(Bid.bidding_status_id == bidding_status_id).all()
+
+
+def bid_of_group(session, group_id: int, bidding_status_id: int) -> Optional[Bid]:
+    return (
+        session.query(Bid)
+        .filter(Bid.group_id == group_id, Bid.bidding_status_id == bidding_status_id)
+        .first()
+    )
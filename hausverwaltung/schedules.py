@@ -0,0 +1,198 @@
+"""Monthly payment schedules resolved into a group by month matrix.
+
+``MonthlyCash`` and ``MonthlyGiro`` hold one row per group and period. A
+schedule is due in a month if it runs on the first day of that month. Where
+schedules of a group overlap, the one that started last applies, so a
+schedule cut off at the start of a bidding period hands over to the new one
+in that month. Longer overlaps and gaps between the schedules of a group are
+reported as issues.
+"""
+
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+import queries
+from models import MonthlyCash, MonthlyGiro
+
+SCHEDULES = {"cash": MonthlyCash, "giro": MonthlyGiro}
+
+
+class ScheduleIssue:
+    """Days on which two schedules of a group overlap, or none runs."""
+
+    def __init__(self, group_id: int, schedule: str, kind: str, start: date, end: date):
+        self.group_id = group_id
+        self.schedule = schedule
+        self.kind = kind
+        self.start = start
+        self.end = end
+
+    def to_dict(self) -> Dict:
+        return {
+            "group_id": self.group_id,
+            "schedule": self.schedule,
+            "kind": self.kind,
+            "start": self.start,
+            "end": self.end,
+        }
+
+
+class PaymentSchedule:
+    """Amounts due per group and month, ``nan`` where no schedule runs.
+
+    ``amounts`` maps ``cash`` and ``giro`` to a matrix with one row per entry
+    of ``group_ids`` and one column per entry of ``months``.
+    """
+
+    def __init__(
+        self,
+        group_ids: np.ndarray,
+        months: np.ndarray,
+        amounts: Dict[str, np.ndarray],
+        issues: List[ScheduleIssue],
+    ):
+        self.group_ids = group_ids
+        self.months = months
+        self.amounts = amounts
+        self.issues = issues
+
+    def due(
+        self, group_id: int, month: date, schedule: str = "cash"
+    ) -> Optional[float]:
+        """Returns the amount due in the month, None if no schedule runs."""
+        row = np.searchsorted(self.group_ids, group_id)
+        column = np.searchsorted(self.months, np.datetime64(month, "M"))
+        if (
+            row == len(self.group_ids)
+            or self.group_ids[row] != group_id
+            or column == len(self.months)
+            or self.months[column] != np.datetime64(month, "M")
+        ):
+            return None
+        amount = self.amounts[schedule][row, column]
+        return None if np.isnan(amount) else float(amount)
+
+
+def _columns(rows: List) -> Dict[str, np.ndarray]:
+    ids, group_ids, amounts, starts, ends = zip(*rows) if rows else ((),) * 5
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "group_id": np.array(group_ids, dtype=np.int64),
+        "amount": np.array(amounts, dtype=float),
+        "start": np.array(starts, dtype="datetime64[D]"),
+        "end": np.array(ends, dtype="datetime64[D]"),
+    }
+
+
+def _resolve(
+    intervals: Dict[str, np.ndarray], group_ids: np.ndarray, months: np.ndarray
+) -> np.ndarray:
+    """Fills the matrix with the amount of the latest started schedule."""
+    amounts = np.full((len(group_ids), len(months)), np.nan)
+    if not len(intervals["id"]) or not len(group_ids):
+        return amounts
+    # Later starts win, schedules starting on the same day by their id.
+    order = np.lexsort((intervals["id"], intervals["start"]))
+    start = intervals["start"][order]
+    start_month = start.astype("datetime64[M]")
+    first = start_month + (start > start_month.astype("datetime64[D]"))
+    last = intervals["end"][order].astype("datetime64[M]")
+    low = np.maximum((first - months[0]).astype(np.int64), 0)
+    high = np.minimum((last - months[0]).astype(np.int64), len(months) - 1)
+    lengths = np.maximum(high - low + 1, 0)
+
+    # One entry per schedule and month it is due in.
+    ranks = np.repeat(np.arange(len(order)), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    offsets = np.arange(lengths.sum()) - starts
+    columns = np.repeat(low, lengths) + offsets
+    rows = np.searchsorted(group_ids, intervals["group_id"][order])[ranks]
+    winner = np.full(amounts.shape, -1)
+    np.maximum.at(winner, (rows, columns), ranks)
+    return np.where(winner >= 0, intervals["amount"][order][winner], np.nan)
+
+
+def _issues(intervals: Dict[str, np.ndarray], schedule: str) -> List[ScheduleIssue]:
+    """Compares every schedule with the latest end of the earlier ones."""
+    if len(intervals["id"]) < 2:
+        return []
+    order = np.lexsort((intervals["id"], intervals["start"], intervals["group_id"]))
+    group_ids = intervals["group_id"][order]
+    starts = intervals["start"][order].astype(np.int64)
+    ends = intervals["end"][order].astype(np.int64)
+    # Offsetting the ends per group keeps the running maximum within a group.
+    group_rank = np.unique(group_ids, return_inverse=True)[1]
+    width = ends.max() - ends.min() + 1
+    keyed = group_rank * width + ends - ends.min()
+    latest_end = np.maximum.accumulate(keyed) - group_rank * width + ends.min()
+
+    same_group = group_ids[1:] == group_ids[:-1]
+    previous_end = latest_end[:-1]
+    start = starts[1:]
+    # A schedule may start on the day the previous one was cut off.
+    overlap = same_group & (start < previous_end)
+    gap = same_group & (start > previous_end + 1)
+
+    def to_date(days: np.ndarray) -> List[date]:
+        return days.astype("datetime64[D]").tolist()
+
+    issues = []
+    for kind, mask, first, last in (
+        ("overlap", overlap, start, np.minimum(previous_end, ends[1:])),
+        ("gap", gap, previous_end + 1, start - 1),
+    ):
+        for group_id, first_day, last_day in zip(
+            group_ids[1:][mask].tolist(), to_date(first[mask]), to_date(last[mask])
+        ):
+            issues.append(ScheduleIssue(group_id, schedule, kind, first_day, last_day))
+    return sorted(issues, key=lambda issue: (issue.group_id, issue.start))
+
+
+def resolve_schedules(
+    session,
+    first_month: date,
+    last_month: date,
+    group_ids: Optional[List[int]] = None,
+    schedules: Sequence[str] = ("cash", "giro"),
+) -> PaymentSchedule:
+    """Loads the schedules running between the two months, one query per table.
+
+    Without ``group_ids`` the matrix has a row for every group with a
+    schedule in the range.
+    """
+    first_month = first_month.replace(day=1)
+    last_month = last_month.replace(day=1)
+    months = np.arange(
+        np.datetime64(first_month, "M"),
+        np.datetime64(last_month, "M") + 1,
+        dtype="datetime64[M]",
+    )
+    intervals = {
+        schedule: _columns(
+            queries.schedule_rows(
+                session, SCHEDULES[schedule], first_month, last_month, group_ids
+            )
+        )
+        for schedule in schedules
+    }
+    if group_ids is not None:
+        rows = np.unique(np.array(group_ids, dtype=np.int64))
+    else:
+        rows = np.unique(
+            np.concatenate([columns["group_id"] for columns in intervals.values()])
+        )
+    return PaymentSchedule(
+        rows,
+        months,
+        {
+            schedule: _resolve(columns, rows, months)
+            for schedule, columns in intervals.items()
+        },
+        [
+            issue
+            for schedule, columns in intervals.items()
+            for issue in _issues(columns, schedule)
+        ],
+    )
@@ -0,0 +1,209 @@
+"""Deterministic synthetic data for benchmarks.
+
+``generate`` fills an empty database with groups, their members and rooms,
+funds, expenses, payment schedules, years of monthly deposits and evaluated
+bidding rounds. The same scale and seed always produce the same rows.
+"""
+
+import random
+from datetime import date, datetime
+from typing import Dict
+
+from sqlalchemy import insert
+
+from models import (
+    Bid,
+    BiddingStatus,
+    Expense,
+    Fund,
+    Group,
+    MonthlyCash,
+    MonthlyGiro,
+    PeopleCategory,
+    Person,
+    Room,
+    Session,
+    Transaction,
+    room_tenants,
+)
+
+FIRST_YEAR = 2022
+
+SCALES: Dict[str, Dict[str, int]] = {
+    "small": {
+        "groups": 10,
+        "persons_per_group": 2,
+        "rooms": 15,
+        "funds": 5,
+        "years": 2,
+        "bidding_rounds": 2,
+    },
+    "medium": {
+        "groups": 50,
+        "persons_per_group": 3,
+        "rooms": 70,
+        "funds": 15,
+        "years": 5,
+        "bidding_rounds": 5,
+    },
+    "large": {
+        "groups": 200,
+        "persons_per_group": 3,
+        "rooms": 280,
+        "funds": 30,
+        "years": 10,
+        "bidding_rounds": 10,
+    },
+}
+
+
+def generate(scale: Dict[str, int], seed: int = 0) -> Dict[str, int]:
+    """Fills the database and returns the number of rows per table.
+
+    Every group pays a monthly amount into the Einzahlungsfonds from January
+    of ``FIRST_YEAR`` on; about one deposit in twenty is missing or short, so
+    the arrears ledger has something to report. Bidding rounds are yearly,
+    the last ``bidding_rounds`` years each get an evaluated round with one
+    bid per group.
+    """
+    rng = random.Random(seed)
+    groups = scale["groups"]
+    years = scale["years"]
+
+    categories = [
+        {"id": 1, "name": "Erwachsen", "monthly_base_need": 900, "head_count": 1.0},
+        {"id": 2, "name": "Kind", "monthly_base_need": 400, "head_count": 0.5},
+    ]
+    funds = [
+        {"id": 1, "name": "Einzahlungsfonds", "current_balance": 0, "yearly_target": 0}
+    ] + [
+        {
+            "id": index + 2,
+            "name": f"Fonds {index}",
+            "current_balance": 0,
+            "yearly_target": rng.randrange(500, 5000, 100),
+        }
+        for index in range(scale["funds"])
+    ]
+    expenses = [
+        {"id": 1, "name": "Miete", "yearly_amount": 12000.0 * groups, "type": "rent"},
+        {
+            "id": 2,
+            "name": "Nebenkosten",
+            "yearly_amount": 2400.0 * groups,
+            "type": "ancillary",
+        },
+    ]
+    rooms = [
+        {"id": index + 1, "name": f"Zimmer {index}", "area": rng.uniform(8, 30)}
+        for index in range(scale["rooms"])
+    ]
+    group_rows = [
+        {
+            "id": index + 1,
+            "name": f"Gruppe {index}",
+            "password": "-",
+            "role": "user",
+            "active": True,
+            "income": rng.randrange(1200, 4000, 50),
+            "last_full_payment_date": date(FIRST_YEAR, 1, 1),
+            "last_updated": date(FIRST_YEAR, 1, 1),
+        }
+        for index in range(groups)
+    ]
+    persons = [
+        {
+            "group_id": group_id,
+            "category_id": 1 if member == 0 or rng.random() < 0.7 else 2,
+        }
+        for group_id in range(1, groups + 1)
+        for member in range(scale["persons_per_group"])
+    ]
+    tenants = [
+        {"room_id": room_id, "group_id": (room_id - 1) % groups + 1}
+        for room_id in range(1, scale["rooms"] + 1)
+    ]
+
+    cash_schedules = []
+    giro_schedules = []
+    deposits = []
+    for group_id in range(1, groups + 1):
+        for year in range(FIRST_YEAR, FIRST_YEAR + years):
+            amount = rng.randrange(100, 400, 5)
+            period = {
+                "group_id": group_id,
+                "start_date": date(year, 1, 1),
+                "end_date": date(year, 12, 31),
+            }
+            cash_schedules.append({**period, "amount": amount})
+            giro_schedules.append({**period, "amount": rng.randrange(200, 600, 5)})
+            for month in range(1, 13):
+                chance = rng.random()
+                if chance < 0.03:
+                    continue
+                deposits.append(
+                    {
+                        "fund_id": 1,
+                        "amount": amount if chance >= 0.05 else amount / 2,
+                        "date": date(year, month, rng.randrange(1, 28)),
+                        "comment": "Einzahlung",
+                        "group_id": group_id,
+                        "confirmed": True,
+                    }
+                )
+
+    rounds = []
+    bids = []
+    for index, year in enumerate(
+        range(FIRST_YEAR + years - scale["bidding_rounds"], FIRST_YEAR + years)
+    ):
+        pledged = [rng.randrange(300, 900, 5) for _ in range(groups)]
+        rounds.append(
+            {
+                "id": index + 1,
+                "status": "evaluated",
+                "total_giro_needed": 400.0 * groups,
+                "total_cash_needed": 200.0 * groups,
+                "total_amount_pledged": float(sum(pledged)),
+                "created_at": datetime(year - 1, 12, 1),
+                "updated_at": datetime(year - 1, 12, 15),
+                "period_start": date(year, 1, 1),
+                "period_end": date(year, 12, 31),
+            }
+        )
+        bids.extend(
+            {
+                "group_id": group_id,
+                "bidding_status_id": index + 1,
+                "amount": float(amount),
+                "submitted_at": datetime(year - 1, 12, 5),
+            }
+            for group_id, amount in enumerate(pledged, start=1)
+        )
+
+    deposit_total = sum(deposit["amount"] for deposit in deposits)
+    funds[0]["current_balance"] = deposit_total
+
+    tables = (
+        (PeopleCategory, categories),
+        (Fund, funds),
+        (Expense, expenses),
+        (Room, rooms),
+        (Group, group_rows),
+        (Person, persons),
+        (room_tenants, tenants),
+        (MonthlyCash, cash_schedules),
+        (MonthlyGiro, giro_schedules),
+        (Transaction, deposits),
+        (BiddingStatus, rounds),
+        (Bid, bids),
+    )
+    with Session() as session:
+        for table, rows in tables:
+            if rows:
+                session.execute(insert(table), rows)
+        session.commit()
+    return {
+        getattr(table, "__tablename__", getattr(table, "name", None)): len(rows)
+        for table, rows in tables
+    }
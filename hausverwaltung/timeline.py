@@ -0,0 +1,198 @@
+"""Sparse step series for the dashboard charts.
+
+A timeline holds one row per series and point in time at which the value of
+the series changes. The value holds until the next change point, so charts
+are drawn as step functions and never need a dense calendar of all days.
+"""
+
+from typing import List, Optional
+
+import pandas as pd
+import plotly.express as px
+from plotly.graph_objects import Figure
+
+import queries
+from cache import IncrementalCache
+
+CHANGE_COLUMNS = ["date", "name", "amount", "details"]
+
+
+def cumulate(
+    events: pd.DataFrame, time: str, series: str, amount: str, value: str
+) -> pd.DataFrame:
+    """Sums the amounts per series and point in time into a running total."""
+    frame = (
+        events.groupby([series, time], as_index=False)[amount]
+        .sum()
+        .sort_values([series, time])
+    )
+    frame[value] = frame.groupby(series)[amount].cumsum()
+    return frame
+
+
+def change_points(
+    levels: pd.DataFrame,
+    time: str,
+    series: str,
+    value: str,
+    end: Optional[pd.Timestamp] = None,
+) -> pd.DataFrame:
+    """Keeps the rows at which the value of a series changes.
+
+    With ``end`` the last value of each series is repeated at that point in
+    time, so the steps reach the end of the displayed range.
+    """
+    frame = (
+        levels.sort_values([series, time])
+        .groupby([series, time], as_index=False)
+        .last()
+    )
+    previous = frame.groupby(series)[value].shift()
+    frame = frame[previous.isna() | (frame[value] != previous)]
+    if end is not None and not frame.empty:
+        last = frame.groupby(series, as_index=False).last()
+        last = last[last[time] < end].copy()
+        last[time] = end
+        for column in last.columns:
+            if column not in (time, series, value) and pd.api.types.is_numeric_dtype(
+                last[column]
+            ):
+                last[column] = 0
+        frame = pd.concat([frame, last], ignore_index=True)
+    return frame.sort_values([series, time]).reset_index(drop=True)
+
+
+def step_chart(
+    timeline: pd.DataFrame,
+    time: str,
+    series: str,
+    value: str,
+    title: str,
+    stacked: bool = True,
+    hover_data: Optional[List[str]] = None,
+) -> Figure:
+    """Draws a timeline as step lines or as a stacked step area chart.
+
+    Stacking needs every series at the same x values, so the series are
+    aligned on the union of their change points only.
+    """
+    hover_data = hover_data or []
+    if stacked:
+        aligned = (
+            timeline.pivot(index=time, columns=series, values=value)
+            .ffill()
+            .fillna(0)
+            .reset_index()
+            .melt(id_vars=time, var_name=series, value_name=value)
+        )
+        if hover_data:
+            aligned = aligned.merge(
+                timeline[[time, series] + hover_data], on=[time, series], how="left"
+            )
+            aligned[hover_data] = aligned[hover_data].fillna(0)
+        figure = px.area(
+            aligned,
+            x=time,
+            y=value,
+            color=series,
+            line_shape="hv",
+            title=title,
+            hover_data={column: True for column in hover_data},
+        )
+    else:
+        figure = px.line(
+            timeline,
+            x=time,
+            y=value,
+            color=series,
+            line_shape="hv",
+            title=title,
+            hover_data={column: True for column in hover_data},
+        )
+    return figure
+
+
+class RentTimeline:
+    """The change log of funds and expenses and the monthly rent built from it.
+
+    ``levels`` holds the change points of the cumulative monthly amount per
+    fund and expense, without the repetition at the end of the range.
+    """
+
+    def __init__(self, changes: pd.DataFrame, levels: pd.DataFrame):
+        self.changes = changes
+        self.levels = levels
+
+    @classmethod
+    def empty(cls) -> "RentTimeline":
+        return cls(
+            pd.DataFrame(columns=CHANGE_COLUMNS),
+            pd.DataFrame(
+                {
+                    "date": pd.Series(dtype="datetime64[ns]"),
+                    "name": pd.Series(dtype=object),
+                    "cumulative_amount": pd.Series(dtype=float),
+                }
+            ),
+        )
+
+    def extend(self, rows: List) -> Optional["RentTimeline"]:
+        """Returns a new timeline that includes the change log ``rows``.
+
+        Only the new rows are summed up, on top of the last level of each
+        series. Returns None if a row is dated before the last change point
+        of its series; such a timeline has to be rebuilt from all rows.
+        """
+        new = pd.DataFrame(rows, columns=CHANGE_COLUMNS)
+        if new.empty:
+            return self
+        new["date"] = pd.to_datetime(new["date"])
+        events = new.assign(date=new["date"].dt.normalize(), amount=new["amount"] / 12)
+        last_dates = self.levels.groupby("name")["date"].max()
+        if (events["date"].to_numpy() < last_dates.reindex(events["name"])).any():
+            return None
+
+        levels = cumulate(events, "date", "name", "amount", "cumulative_amount")
+        totals = self.levels.groupby("name")["cumulative_amount"].last()
+        levels["cumulative_amount"] += (
+            totals.reindex(levels["name"]).fillna(0).to_numpy()
+        )
+        combined = pd.concat(
+            [self.levels, levels[["date", "name", "cumulative_amount"]]],
+            ignore_index=True,
+        ).drop_duplicates(["name", "date"], keep="last")
+        changes = pd.concat([self.changes, new], ignore_index=True)
+        return RentTimeline(
+            changes.sort_values("date", kind="stable", ignore_index=True),
+            change_points(combined, "date", "name", "cumulative_amount"),
+        )
+
+
+rent_timeline_cache = IncrementalCache("rent_timeline")
+
+
+def rent_timeline(session) -> RentTimeline:
+    """Returns the rent timeline up to the latest change log entries.
+
+    The timeline is cached by the highest change log ids and extended by
+    the entries added since. Renaming or deleting a fund or an expense
+    changes the series of older entries, so the timeline is rebuilt then.
+    """
+    names = (
+        tuple(sorted(queries.expense_names(session).items())),
+        tuple(sorted(queries.fund_names(session).items())),
+    )
+    mark = queries.change_log_marks(session)
+
+    def build(timeline: Optional[RentTimeline], since) -> RentTimeline:
+        if timeline is not None:
+            extended = timeline.extend(
+                queries.change_log_rows(session, after=since, through=mark)
+            )
+            if extended is not None:
+                return extended
+        return RentTimeline.empty().extend(
+            queries.change_log_rows(session, through=mark)
+        )
+
+    return rent_timeline_cache.get(names, mark, build)